@@ -0,0 +1,229 @@
+/* Clientside (browser-executed) callbacks - draw_figure is always used, the versions of the callbacks in hyp_controller.py are only used when HYP_CLIENTSIDE is set */
+
+/* Log of the gamma function (Lanczos approximation, g=7) */
+function hypLogGamma(x) {
+    const c = [0.99999999999980993, 676.5203681218851, -1259.1392167224028,
+               771.32342877765313, -176.61502916214059, 12.507343278686905,
+               -0.13857109526572012, 9.9843695780195716e-6, 1.5056327351493116e-7];
+    if (x < 0.5) {
+        return Math.log(Math.PI / Math.abs(Math.sin(Math.PI * x))) - hypLogGamma(1 - x);
+    }
+    x -= 1;
+    let a = c[0];
+    const t = x + 7.5;
+    for (let i = 1; i < 9; i++) {
+        a += c[i] / (x + i);
+    }
+    return 0.5 * Math.log(2 * Math.PI) + (x + 0.5) * Math.log(t) - t + Math.log(a);
+}
+
+/* Continued fraction for the regularized incomplete beta function (modified Lentz's method) */
+function hypBetaContinuedFraction(x, a, b) {
+    const tiny = 1e-300;
+    let c = 1;
+    let d = 1 - (a + b) * x / (a + 1);
+    if (Math.abs(d) < tiny) d = tiny;
+    d = 1 / d;
+    let h = d;
+    for (let m = 1; m <= 1000; m++) {
+        const m2 = 2 * m;
+        let aa = m * (b - m) * x / ((a + m2 - 1) * (a + m2));
+        d = 1 + aa * d;
+        if (Math.abs(d) < tiny) d = tiny;
+        c = 1 + aa / c;
+        if (Math.abs(c) < tiny) c = tiny;
+        d = 1 / d;
+        h *= d * c;
+        aa = -(a + m) * (a + b + m) * x / ((a + m2) * (a + m2 + 1));
+        d = 1 + aa * d;
+        if (Math.abs(d) < tiny) d = tiny;
+        c = 1 + aa / c;
+        if (Math.abs(c) < tiny) c = tiny;
+        d = 1 / d;
+        const delta = d * c;
+        h *= delta;
+        if (Math.abs(delta - 1) < 1e-16) break;
+    }
+    return h;
+}
+
+/* Regularized incomplete beta function I_x(a, b) */
+function hypIncompleteBeta(x, a, b) {
+    if (x <= 0) return 0;
+    if (x >= 1) return 1;
+    const front = Math.exp(hypLogGamma(a + b) - hypLogGamma(a) - hypLogGamma(b) +
+                           a * Math.log(x) + b * Math.log(1 - x));
+    if (x < (a + 1) / (a + b + 2)) {
+        return front * hypBetaContinuedFraction(x, a, b) / a;
+    }
+    return 1 - front * hypBetaContinuedFraction(1 - x, b, a) / b;
+}
+
+/* Cumulative distribution function of the t distribution with nu degrees of freedom */
+function hypTCdf(t, nu) {
+    const tail = 0.5 * hypIncompleteBeta(nu / (nu + t * t), nu / 2, 0.5);
+    return t > 0 ? 1 - tail : tail;
+}
+
+/* Probability density function of the t distribution with nu degrees of freedom */
+function hypTPdf(t, nu) {
+    return Math.exp(hypLogGamma((nu + 1) / 2) - hypLogGamma(nu / 2) -
+                    0.5 * Math.log(nu * Math.PI) - (nu + 1) / 2 * Math.log(1 + t * t / nu));
+}
+
+/* Quantile function of the t distribution with nu degrees of freedom (bracketed Newton's method) */
+function hypTPpf(q, nu) {
+    if (q === 0.5) return 0;
+    if (q < 0.5) return -hypTPpf(1 - q, nu);
+    let lo = 0;
+    let hi = 1;
+    while (hypTCdf(hi, nu) < q) {
+        lo = hi;
+        hi *= 2;
+    }
+    let t = (lo + hi) / 2;
+    for (let i = 0; i < 200; i++) {
+        const f = hypTCdf(t, nu) - q;
+        if (f > 0) hi = t; else lo = t;
+        let next = t - f / hypTPdf(t, nu);
+        if (!(next > lo && next < hi)) next = (lo + hi) / 2;
+        if (Math.abs(next - t) <= 1e-15 * Math.max(1, Math.abs(t))) return next;
+        t = next;
+    }
+    return t;
+}
+
+/* Sample size, mean, standard error of the mean and degrees of freedom for a dataset */
+function hypSummarise(values) {
+    const n = values.length;
+    const mean = values.reduce((total, x) => total + x, 0) / n;
+    const variance = values.reduce((total, x) => total + (x - mean) * (x - mean), 0) / (n - 1);
+    return {n: n, mean: mean, sem: Math.sqrt(variance / n), nu: n - 1};
+}
+
+/* Confidence interval for the population mean - equivalent to hyp_model.update_statistics */
+function hypConfInterval(summary, alternative, alpha) {
+    const confidence = (alternative === "<" || alternative === ">") ? alpha : (2 * alpha) - 1;
+    const crit = hypTPpf((1 + confidence) / 2, summary.nu);
+    return [summary.mean - crit * summary.sem, summary.mean + crit * summary.sem];
+}
+
+/* p value for a one-sample t-test - equivalent to hyp_model.t_test_p */
+function hypPValue(summary, hypMean, alternative) {
+    const t = (summary.mean - hypMean) / summary.sem;
+    if (alternative === "<") return hypTCdf(t, summary.nu);
+    if (alternative === ">") return hypTCdf(-t, summary.nu);
+    return 2 * hypTCdf(-Math.abs(t), summary.nu);
+}
+
+/* Confidence interval end marker symbols and sizes for each alternative hypothesis - equivalent to hyp_controller.ci_markers */
+const hypCiMarkers = {"<": [["arrow-left", "line-ns"], [14, 12]],
+                      ">": [["line-ns", "arrow-right"], [12, 14]],
+                      "!=": [["line-ns", "line-ns"], [12, 12]]};
+
+/* Confidence interval and hypothesised mean traces - equivalent to hyp_controller.add_ci_traces */
+function hypCiTraces(start, end, ciLower, ciUpper, hypMean, alternative) {
+    const [symbols, sizes] = hypCiMarkers[alternative];
+    const xLower = alternative === "<" ? start : ciLower;
+    const xUpper = alternative === ">" ? end : ciUpper;
+    return [{type: "scatter", x: [xLower, xUpper], y: [0.5, 0.5], name: "Confidence<br>interval", mode: "lines+markers",
+             hoverinfo: "skip", line: {color: "#d10373"},
+             marker: {symbol: symbols, size: sizes, color: "#d10373", line: {width: 2, color: "#d10373"}}},
+            {type: "scatter", x: [hypMean], y: [0.5], name: "Hypothesised<br>mean", mode: "markers",
+             hovertemplate: "Hypothesised mean: %{x}<extra></extra>",
+             marker: {symbol: "circle-x-open", color: "#d10373", size: 16}}];
+}
+
+/* Format a confidence level or p value as a percentage, as Python's {:.0%} / {:.1%} format specifiers */
+function hypPercent(x, digits) {
+    return (x * 100).toFixed(digits) + "%";
+}
+
+/* Dataset name used for the selected dataset and column - equivalent to hyp_model.dataset_key */
+function hypDatasetKey(dataset, column, clientData) {
+    const columns = clientData[dataset].columns;
+    if (!columns) return dataset;
+    return `${dataset}:${columns.includes(column) ? column : columns[0]}`;
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    hyp: {
+        /* Equivalent to hyp_controller.update_results for the t-test - the method selector is hidden in clientside mode */
+        update_results: function(n_clicks, table, column, hypMean, alternative, alpha, method, clientData) {
+            if (!n_clicks || !clientData) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            const dataset = hypDatasetKey(table, column, clientData);
+            const data = clientData[dataset];
+            const summary = hypSummarise(data.values);
+            const confInt = hypConfInterval(summary, alternative, alpha);
+            const p = hypPValue(summary, hypMean, alternative);
+            const ciTraces = {dataset: dataset, traces: hypCiTraces(data.start, data.end, confInt[0], confInt[1], hypMean, alternative)};
+            let srText, confText, confVal;
+            if (alternative === "<") {
+                srText = `${data.description} with upper bound for population mean of ${confInt[1].toFixed(3)} and hypothesised mean of ${hypMean}`;
+                confText = "Upper bound for population mean: ";
+                confVal = confInt[1].toFixed(3);
+            } else if (alternative === ">") {
+                srText = `${data.description} with lower bound for population mean of ${confInt[0].toFixed(3)} and hypothesised mean of ${hypMean}`;
+                confText = "Lower bound for population mean: ";
+                confVal = confInt[0].toFixed(3);
+            } else {
+                srText = `${data.description} with confidence interval (${confInt[0].toFixed(3)}, ${confInt[1].toFixed(3)}) and hypothesised mean of ${hypMean}`;
+                confText = "Confidence interval for population mean: ";
+                confVal = `(${confInt[0].toFixed(3)}, ${confInt[1].toFixed(3)})`;
+            }
+            const nullHyp = data.null_hyp.replace("{hyp_mean}", hypMean);
+            const altHyp = data.alt_hyp.replace("{relation}", data.relations[alternative]).replace("{hyp_mean}", hypMean);
+            return [ciTraces, srText, nullHyp, altHyp, `${p.toFixed(3)} (${hypPercent(p, 1)})`, p, confText, confVal,
+                    {display: "inline"}, null, ""];
+        },
+        /* Draw graph from the base figure for the selected dataset (or uploaded dataset) and the confidence interval traces */
+        draw_figure: function(ciTraces, figures, uploadFigures) {
+            if (!ciTraces || !figures) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            const base = figures.figures[ciTraces.dataset] || (uploadFigures || {})[ciTraces.dataset];
+            return {data: base.data.concat(ciTraces.traces), layout: Object.assign({template: figures.template}, base.layout)};
+        },
+        /* Draw the p value and power curves with the figure template */
+        draw_sweep: function(sweep, figures) {
+            if (!sweep || !figures) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            return {data: sweep.data, layout: Object.assign({template: figures.template}, sweep.layout)};
+        },
+        /* Equivalent to hyp_controller.accept_or_reject */
+        accept_or_reject: function(acceptReject, p, alpha) {
+            if (acceptReject === null || acceptReject === undefined || p === null || p === undefined) {
+                return "";
+            }
+            const reject = p < 1 - alpha;
+            const correct = (acceptReject === "reject") === reject;
+            const detail = reject
+                ? ` - ${p.toFixed(3)} is less than ${(1 - alpha).toFixed(2)}, so we reject the null hypothesis at the ${hypPercent(alpha, 0)} confidence level`
+                : ` - ${p.toFixed(3)} is greater than ${(1 - alpha).toFixed(2)}, so we accept the null hypothesis at the ${hypPercent(alpha, 0)} confidence level`;
+            return [{namespace: "dash_html_components", type: "Span", props: {children: correct ? "Correct" : "Incorrect", className: "bold-p"}},
+                    {namespace: "dash_html_components", type: "Span", props: {children: [detail]}}];
+        },
+        /* Equivalent to hyp_controller.update_data_info */
+        update_data_info: function(dataset, column, clientData) {
+            if (!clientData) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            const info = clientData[hypDatasetKey(dataset, column, clientData)].info;
+            return [info.min, info.max, info.value, info.marks, info.step, info.text];
+        },
+        /* Equivalent to hyp_controller.update_columns */
+        update_columns: function(dataset, clientData) {
+            if (!clientData) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            const columns = clientData[dataset].columns;
+            if (!columns) {
+                return [[], null, {display: "none"}];
+            }
+            return [columns.map(column => ({label: column.replace(/_/g, " "), value: column})), columns[0], {display: "block"}];
+        }
+    }
+});
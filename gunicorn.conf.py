@@ -0,0 +1,26 @@
+import gc
+import multiprocessing
+import os
+
+# Production server settings, read by gunicorn hyp_controller:server - set PORT, HYP_WORKERS and HYP_THREADS to override the defaults
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+# One worker process per core by default - the t-test callbacks are CPU-bound, so threads alone would be limited by the GIL
+workers = int(os.environ.get("HYP_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.environ.get("HYP_THREADS", 2))
+timeout = int(os.environ.get("HYP_TIMEOUT", 30))
+
+# Load the app in the master process before forking the workers, so that the datasets, summary statistics and precomputed t-test results are shared copy-on-write instead of being loaded by every worker
+preload_app = True
+# Warm the caches before forking - a background warm-up thread would only run in the master process
+os.environ.setdefault("HYP_WARM_CACHE", "startup")
+
+
+# Build the shared dataset store (see hyp_store) once in the master process, before any worker starts, so that every worker maps the same read-only copy of the datasets rather than loading its own
+def on_starting(server):
+    import hyp_model
+    hyp_model.build_store()
+
+
+# Move the preloaded objects out of the garbage collector's tracked generations, so that collections in the workers do not write to (and so copy) the shared pages
+def pre_fork(server, worker):
+    gc.freeze()
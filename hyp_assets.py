@@ -0,0 +1,128 @@
+import gzip
+import importlib
+import mimetypes
+import os
+import sys
+from pathlib import Path
+import brotli
+import flask
+from dash.fingerprint import check_fingerprint
+
+root_dir = Path(__file__).resolve().parent
+assets_dir = root_dir / "assets"
+# Source TrueType fonts, converted to WOFF2 in assets/
+fonts_dir = root_dir / "fonts"
+# Brotli and gzip versions of the assets and Dash's component bundles, generated by python hyp_assets.py
+build_dir = root_dir / "build"
+
+# Characters kept in the WOFF2 font subsets - Basic Latin, Latin-1, Greek, general punctuation, arrows and mathematical operators (e.g. "≤", "≠")
+font_unicodes = "U+0000-00FF,U+0370-03FF,U+2000-206F,U+2190-21FF,U+2200-22FF"
+# File types worth compressing - fonts and images are already compressed
+compressed_types = (".js", ".css", ".map", ".json", ".ico", ".svg", ".txt")
+# Encodings of the precompressed files, in order of preference, and their file extensions
+encodings = {"br": ".br", "gzip": ".gz"}
+# Packages whose component bundles are served from /_dash-component-suites/
+component_packages = ["dash", "dash_bootstrap_components"]
+
+
+# Convert each TrueType font in fonts/ to a WOFF2 subset in assets/ - requires fonttools, which is only needed to rebuild the fonts
+def convert_fonts():
+    from fontTools import subset
+    for path in sorted(fonts_dir.glob("*.ttf")):
+        output = assets_dir / f"{path.stem}.woff2"
+        subset.main([str(path), f"--unicodes={font_unicodes}", "--layout-features=*", "--flavor=woff2", f"--output-file={output}"])
+        print(f"{path.name}: {path.stat().st_size} -> {output.name}: {output.stat().st_size} bytes")
+
+
+# Write Brotli and gzip versions of a file, at the highest compression levels as they are only generated once
+def compress_file(path, output):
+    data = path.read_bytes()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    Path(f"{output}{encodings['br']}").write_bytes(brotli.compress(data, quality=11))
+    Path(f"{output}{encodings['gzip']}").write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+
+
+# Package directory and every file that Dash serves from /_dash-component-suites/<package>/ (as paths relative to the package directory)
+def component_files(package_name):
+    package_dir = Path(importlib.import_module(package_name).__file__).parent
+    for path in sorted(package_dir.rglob("*")):
+        if path.suffix in compressed_types and path.is_file() and "__pycache__" not in path.parts:
+            yield package_dir, path.relative_to(package_dir)
+
+
+# Compress the assets and component bundles into build/, mirroring the URL paths they are served from
+def compress_assets():
+    for path in sorted(assets_dir.rglob("*")):
+        if path.suffix in compressed_types and path.is_file():
+            compress_file(path, build_dir / "assets" / path.relative_to(assets_dir))
+    for package_name in component_packages:
+        for package_dir, path in component_files(package_name):
+            if path.suffix in (".js", ".css"):
+                compress_file(package_dir / path, build_dir / "_dash-component-suites" / package_name / path)
+
+
+# Precompressed files for each served file, as {(url prefix, path): (source, {encoding: compressed path})} - files changed since they were compressed are left out, so that they are not served stale
+def find_precompressed():
+    if not build_dir.is_dir():
+        return {}
+    sources = {("assets", str(path.relative_to(assets_dir).as_posix())): path
+               for path in assets_dir.rglob("*") if path.is_file()}
+    for package_name in component_packages:
+        for package_dir, path in component_files(package_name):
+            sources[("_dash-component-suites", f"{package_name}/{path.as_posix()}")] = package_dir / path
+    precompressed = {}
+    for key, source in sources.items():
+        compressed = {}
+        for encoding, extension in encodings.items():
+            path = build_dir / key[0] / f"{key[1]}{extension}"
+            if path.is_file() and path.stat().st_mtime >= source.stat().st_mtime:
+                compressed[encoding] = path
+        if compressed:
+            precompressed[key] = (source, compressed)
+    return precompressed
+
+
+# Serve the precompressed version of assets and component bundles in the encoding preferred by the browser, with a one year cache lifetime for fingerprinted URLs - other responses are left to Flask/Flask-Compress
+def serve_precompressed(app):
+    precompressed = find_precompressed()
+    if not precompressed:
+        return
+    assets_prefix = app.config.routes_pathname_prefix + app.config.assets_url_path.strip("/") + "/"
+    suites_prefix = app.config.routes_pathname_prefix + "_dash-component-suites/"
+
+    @app.server.before_request
+    def send_precompressed():
+        path = flask.request.path
+        if path.startswith(assets_prefix):
+            key = ("assets", path[len(assets_prefix):])
+            # Dash fingerprints assets with their modification time in the query string
+            fingerprinted = "m" in flask.request.args
+        elif path.startswith(suites_prefix):
+            file_path, fingerprinted = check_fingerprint(path[len(suites_prefix):])
+            key = ("_dash-component-suites", file_path)
+        else:
+            return None
+        if key not in precompressed:
+            return None
+        source, compressed = precompressed[key]
+        accepted = flask.request.accept_encodings
+        encoding = next((encoding for encoding in compressed if encoding in accepted), None)
+        if encoding is None:
+            return None
+        response = flask.send_file(compressed[encoding], mimetype=mimetypes.guess_type(source.name)[0], conditional=True,
+                                   etag=f"{source.stat().st_mtime_ns}-{encoding}", max_age=31536000 if fingerprinted else 0)
+        response.headers["Content-Encoding"] = encoding
+        del response.headers["Content-Disposition"]
+        response.headers["Vary"] = "Accept-Encoding"
+        if fingerprinted:
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        return response
+
+
+if __name__ == "__main__":
+    if "--compress-only" not in sys.argv:
+        convert_fonts()
+    compress_assets()
+    sizes = [os.path.getsize(path) for path in build_dir.rglob("*") if path.is_file()]
+    print(f"Wrote {len(sizes)} precompressed files ({sum(sizes)} bytes) to {build_dir}")
@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import timeit
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import scipy.stats as stat
+from plotly.utils import PlotlyJSONEncoder
+from hyp_model import get_values, stream_summary, t_test_1sided, t_test_2sided, t_test_sweep, resample, bootstrap_chunk, sign_flip_chunk
+from hyp_view import alpha_marks
+
+datasets = {"antacid": (get_values("antacid").tolist(), 12),
+            "grades": (get_values("grades").tolist(), 80),
+            "rda": (get_values("rda").tolist(), 18)}
+
+
+# Per-request t-test as originally implemented - mean, SEM and degrees of freedom recomputed from the raw list every time
+def t_test_raw(dataset, hyp_mean, alternative, alpha):
+    mean = np.mean(dataset)
+    sem = stat.sem(dataset)
+    nu = len(dataset) - 1
+    _, p = stat.ttest_1samp(a=dataset, popmean=hyp_mean, alternative=alternative)
+    confidence = alpha if alternative != "two-sided" else (2*alpha)-1
+    conf_int = stat.t.interval(df=nu, confidence=confidence, loc=mean, scale=sem)
+    return p, conf_int
+
+
+# Per-request t-test served from the cached summary statistics in hyp_model
+def t_test_cached(dataset, hyp_mean, alternative, alpha):
+    if alternative == "two-sided":
+        return t_test_2sided(dataset, hyp_mean, alpha)
+    return t_test_1sided(dataset, hyp_mean, alternative, alpha)
+
+
+# Time each implementation for every dataset and alternative, reporting the best mean time per call in microseconds
+def run_microbenchmark(number=2000, repeat=5):
+    results = {}
+    for name, (values, hyp_mean) in datasets.items():
+        for alternative in ["less", "greater", "two-sided"]:
+            raw = min(timeit.repeat(lambda: t_test_raw(values, hyp_mean, alternative, 0.95),
+                                    number=number, repeat=repeat)) / number
+            cached = min(timeit.repeat(lambda: t_test_cached(name, hyp_mean, alternative, 0.95),
+                                       number=number, repeat=repeat)) / number
+            results[(name, alternative)] = (raw * 1e6, cached * 1e6)
+    return results
+
+
+
+# Throughput, latency percentiles, response size and peak allocation for one callback, from the calls made with each set of arguments in turn
+def measure(func, calls, repeat, response_bytes):
+    # Untimed pass, so that every call is served from warm caches
+    for args in calls:
+        func(*args)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for args in calls:
+            call_start = time.perf_counter()
+            func(*args)
+            latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    # Peak memory allocated during each call, measured in a separate pass as tracemalloc slows down every allocation
+    tracemalloc.start()
+    peaks = []
+    sizes = []
+    for args in calls:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        result = func(*args)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        sizes.append(response_bytes(result))
+    tracemalloc.stop()
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1e6
+    return {"calls": len(latencies),
+            "throughput_per_s": len(latencies) / elapsed,
+            "p50_us": p50,
+            "p95_us": p95,
+            "p99_us": p99,
+            "response_bytes": float(np.mean(sizes)),
+            "alloc_peak_bytes": float(np.mean(peaks))}
+
+
+# Size of a callback's return value when serialized as it would be in a response
+def json_bytes(result):
+    return len(json.dumps(result, cls=PlotlyJSONEncoder))
+
+
+# Run the callbacks directly and through the /_dash-update-component endpoint with a Flask test client, for every dataset, alternative hypothesis and confidence level slider mark. With response_cache=False, update_results responses are not cached, so that repeated submissions measure the cold response time
+def run_callback_benchmark(repeat=20, response_cache=True):
+    # Warm the caches before the app is imported, so that a background warm-up does not run during the timings
+    os.environ.setdefault("HYP_WARM_CACHE", "startup")
+    if not response_cache:
+        os.environ["HYP_RESPONSE_CACHE_SIZE"] = "0"
+    import hyp_controller as controller
+
+    selections = [tuple(key.split(":", 1)) if ":" in key else (key, None) for key in controller.configs]
+    results_args = [(controller.dataset_key(dataset, column), controller.configs[controller.dataset_key(dataset, column)].slider.value, alternative, alpha)
+                    for dataset, column in selections
+                    for alternative in ["<", ">", "!="]
+                    for alpha in alpha_marks]
+    conclusion_args = [(accept_reject, p, alpha)
+                       for accept_reject in ["accept", "reject"]
+                       for p in [0.001, 0.04, 0.3]
+                       for alpha in alpha_marks]
+
+    client = controller.app.server.test_client()
+    dependencies = client.get("/_dash-dependencies").get_json()
+
+    # Request body for the callback with the given first output, giving each input and state its value by component id
+    def request_body(output, values):
+        callback = next(d for d in dependencies if d["output"].strip(".").startswith(output))
+        outputs = [{"id": o.split(".")[0], "property": o.split(".")[1]} for o in callback["output"].strip(".").split("...")]
+        inputs = [dict(i, value=values[i["id"]]) for i in callback["inputs"]]
+        return {"output": callback["output"],
+                "outputs": outputs if len(outputs) > 1 else outputs[0],
+                "inputs": inputs,
+                "changedPropIds": [f"{inputs[0]['id']}.{inputs[0]['property']}"],
+                "state": [dict(s, value=values[s["id"]]) for s in callback.get("state", [])]}
+
+    def post(body):
+        return client.post("/_dash-update-component", json=body)
+
+    results_bodies = [(request_body("ci-store.data", {"submit": 1, "dropdown": dataset, "column": column, "hyp-mean": controller.configs[controller.dataset_key(dataset, column)].slider.value, "alt-hyp-dropdown": alternative, "alpha": alpha, "method": "t"}),)
+                      for dataset, column in selections
+                      for alternative in ["<", ">", "!="]
+                      for alpha in alpha_marks]
+    conclusion_bodies = [(request_body("conclusion.children", {"accept-reject": accept_reject, "p-store": p, "alpha": alpha}),)
+                         for accept_reject, p, alpha in conclusion_args]
+    data_info_bodies = [(request_body("hyp-mean.min", {"dropdown": dataset, "column": column}),) for dataset, column in selections]
+
+    return {"direct": {"update_histogram": measure(controller.update_histogram, results_args, repeat, json_bytes),
+                       "perform_t_test": measure(controller.perform_t_test, results_args, repeat, json_bytes),
+                       "accept_or_reject": measure(controller.accept_or_reject, conclusion_args, repeat, json_bytes),
+                       "update_data_info": measure(controller.update_data_info, selections, repeat, json_bytes)},
+            "http": {"update_results": measure(post, results_bodies, repeat, lambda response: len(response.data)),
+                     "accept_or_reject": measure(post, conclusion_bodies, repeat, lambda response: len(response.data)),
+                     "update_data_info": measure(post, data_info_bodies, repeat, lambda response: len(response.data))}}
+
+
+# Short hash of the current git commit, so that saved results can be matched to the code they measured
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Print the callback benchmark results, with the change in p50 latency against earlier results if given
+def print_callback_benchmark(results, previous=None):
+    print(f"{'mode':<8}{'callback':<20}{'calls/s':>10}{'p50 (us)':>10}{'p95 (us)':>10}{'p99 (us)':>10}{'bytes':>8}{'alloc (B)':>11}{'p50 vs prev':>13}")
+    for mode, callbacks in results["callbacks"].items():
+        for name, r in callbacks.items():
+            change = ""
+            if previous is not None and name in previous["callbacks"].get(mode, {}):
+                change = f"{r['p50_us'] / previous['callbacks'][mode][name]['p50_us']:.2f}x"
+            print(f"{mode:<8}{name:<20}{r['throughput_per_s']:>10.0f}{r['p50_us']:>10.1f}{r['p95_us']:>10.1f}{r['p99_us']:>10.1f}"
+                  f"{r['response_bytes']:>8.0f}{r['alloc_peak_bytes']:>11.0f}{change:>13}")
+
+
+# Write rows normally distributed values, chunk_rows at a time, as a one-column CSV file, a .npy file and a raw float64 file in directory
+def write_stream_files(directory, rows, chunk_rows=1 << 20):
+    rng = np.random.default_rng(0)
+    paths = {"csv": os.path.join(directory, "values.csv"),
+             "npy": os.path.join(directory, "values.npy"),
+             "f64": os.path.join(directory, "values.f64")}
+    npy = np.lib.format.open_memmap(paths["npy"], mode="w+", dtype=np.float64, shape=(rows,))
+    with open(paths["csv"], "w") as csv, open(paths["f64"], "wb") as raw:
+        csv.write("value\n")
+        for start in range(0, rows, chunk_rows):
+            chunk = rng.normal(12, 3, min(chunk_rows, rows - start))
+            np.savetxt(csv, chunk, fmt="%.17g")
+            chunk.tofile(raw)
+            npy[start:start + len(chunk)] = chunk
+    npy.flush()
+    return paths
+
+
+# Stream a CSV, .npy and raw binary file of the given number of rows through the t-test summary, reporting rows per second and the peak memory allocated (memory-mapped pages are not counted, as they are backed by the file)
+def run_stream_benchmark(rows, chunk_rows=1 << 20):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_stream_files(directory, rows)
+        for kind, path in paths.items():
+            tracemalloc.start()
+            start = time.perf_counter()
+            summary, read = stream_summary(path, chunk_rows=chunk_rows)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[kind] = {"rows": read,
+                             "rows_per_s": read / elapsed,
+                             "peak_bytes": peak,
+                             "mean": float(summary["mean"]),
+                             "sem": float(summary["sem"])}
+    return results
+
+
+# Sweep the hypothesised mean across each dataset's range in the given number of points, for each alternative hypothesis, reporting the time per sweep and the time per point
+def run_sweep_benchmark(points, repeat=20):
+    results = {}
+    for name, (values, _) in datasets.items():
+        hyp_means = np.linspace(min(values), max(values), points)
+        for alternative in ["less", "greater", "two-sided"]:
+            timing = measure(t_test_sweep, [(name, hyp_means, alternative, 0.95, hyp_means[points // 2])], repeat, lambda result: result.nbytes)
+            results[(name, alternative)] = {"p50_ms": timing["p50_us"] / 1e3,
+                                            "p99_ms": timing["p99_us"] / 1e3,
+                                            "per_point_us": timing["p50_us"] / points}
+    return results
+
+
+# Draw the given number of bootstrap resamples and sign flips of each dataset (uncached), over the given number of processes, reporting the time and peak memory of each
+def run_resample_benchmark(total, processes=1, repeat=5):
+    results = {}
+    for name in datasets:
+        values = get_values(name)
+        for kind, func in [("bootstrap", bootstrap_chunk), ("sign-flip", sign_flip_chunk)]:
+            timing = measure(resample, [(func, values, total, processes)], repeat, lambda result: result.nbytes)
+            results[(name, kind)] = {"p50_ms": timing["p50_us"] / 1e3,
+                                     "p99_ms": timing["p99_us"] / 1e3,
+                                     "peak_mb": timing["alloc_peak_bytes"] / 1e6}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the t-test and the Dash callbacks")
+    parser.add_argument("--callbacks", action="store_true", help="benchmark the callbacks directly and through the HTTP endpoint, rather than the t-test alone")
+    parser.add_argument("--repeat", type=int, default=20, help="number of times each callback is called with each set of arguments")
+    parser.add_argument("--output", help="save the callback results as JSON to this file")
+    parser.add_argument("--compare", help="JSON file of earlier callback results to compare against")
+    parser.add_argument("--stream", type=int, metavar="ROWS", help="benchmark the streaming t-test summary on generated files of this many rows")
+    parser.add_argument("--sweep", type=int, metavar="POINTS", help="benchmark the vectorized t-test sweep over this many hypothesised means")
+    parser.add_argument("--resample", type=int, metavar="B", help="benchmark drawing this many bootstrap resamples and sign flips")
+    parser.add_argument("--processes", type=int, default=1, help="processes used by the resampling benchmark")
+    parser.add_argument("--no-response-cache", action="store_true", help="disable the update_results response cache in the callback benchmark, to measure cold responses")
+    parser.add_argument("--chunk-rows", type=int, default=1 << 20, help="rows read at a time by the streaming benchmark")
+    args = parser.parse_args()
+
+    if args.resample:
+        print(f"{'dataset':<10}{'resampling':<12}{'p50 (ms)':>12}{'p99 (ms)':>12}{'peak memory (MB)':>18}")
+        for (name, kind), r in run_resample_benchmark(args.resample, args.processes, args.repeat).items():
+            print(f"{name:<10}{kind:<12}{r['p50_ms']:>12.2f}{r['p99_ms']:>12.2f}{r['peak_mb']:>18.1f}")
+    elif args.sweep:
+        print(f"{'dataset':<10}{'alternative':<12}{'p50 (ms)':>12}{'p99 (ms)':>12}{'per point (us)':>16}")
+        for (name, alternative), r in run_sweep_benchmark(args.sweep, args.repeat).items():
+            print(f"{name:<10}{alternative:<12}{r['p50_ms']:>12.2f}{r['p99_ms']:>12.2f}{r['per_point_us']:>16.3f}")
+    elif args.stream:
+        print(f"{'file':<6}{'rows':>14}{'rows/s':>16}{'peak memory (MB)':>18}{'mean':>12}{'SEM':>12}")
+        for kind, r in run_stream_benchmark(args.stream, args.chunk_rows).items():
+            print(f"{kind:<6}{r['rows']:>14}{r['rows_per_s']:>16.0f}{r['peak_bytes'] / 1e6:>18.1f}{r['mean']:>12.6f}{r['sem']:>12.8f}")
+    elif args.callbacks:
+        results = {"commit": git_commit(),
+                   "timestamp": datetime.now(timezone.utc).isoformat(),
+                   "python": platform.python_version(),
+                   "response_cache": not args.no_response_cache,
+                   "callbacks": run_callback_benchmark(args.repeat, not args.no_response_cache)}
+        previous = None
+        if args.compare:
+            with open(args.compare) as f:
+                previous = json.load(f)
+        print_callback_benchmark(results, previous)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+    else:
+        print(f"{'dataset':<10}{'alternative':<12}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+        for (name, alternative), (before, after) in run_microbenchmark().items():
+            print(f"{name:<10}{alternative:<12}{before:>14.1f}{after:>14.1f}{before / after:>9.1f}x")
@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+
+
+# Bounded, thread-safe cache that evicts the least recently used entry when full - maxsize is a number of entries or, if sizeof is given, the total of sizeof(value) over the cached values (e.g. bytes)
+class LRUCache:
+    def __init__(self, maxsize, sizeof=None):
+        self.maxsize = maxsize
+        self.sizeof = sizeof
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Cached value for key, or default if it is not cached
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    # Size of a value, counted against maxsize
+    def measure(self, value):
+        return 1 if self.sizeof is None else self.sizeof(value)
+
+    # Cache value for key, evicting the least recently used entries if the cache is full - a single value bigger than maxsize is kept until the next put, so that it can be used once cached
+    def put(self, key, value):
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.measure(self.entries[key])
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            self.size += self.measure(value)
+            while self.size > self.maxsize and (len(self.entries) > 1 or self.maxsize <= 0):
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= self.measure(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    # Hit/miss/eviction counters and size - used for monitoring
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "size": self.size,
+                    "maxsize": self.maxsize}
@@ -0,0 +1,187 @@
+import json
+import math
+from hyp_model import data_dir, dataset_columns, get_measurement_columns, get_values, get_upload, read_csv_header, upload_prefix
+from hyp_cache import LRUCache
+
+# Settings for each dataset are read from a JSON metadata file next to its CSV file (e.g. data/antacid.json), and compiled once, on first use, into immutable config objects (holding read-only dicts), with the payloads sent to the browser precomputed. Anything missing from the metadata - or the whole file - is derived from the data. Metadata keys:
+#   label, order - dropdown label and position (datasets without an order are listed last, by name)
+#   histogram - start, end, size (bins and x-axis range), name (trace name), hover (hover text label) and description (screen reader text)
+#   hypothesis - null and alt, the hypothesis text formatted with {hyp_mean} and {relation}
+#   slider - min, max, value, step and mark_step (the spacing of the marks) of the hypothesised mean slider
+#   text - data description
+#   subjects - for multi-column files, what each row describes (e.g. "survey respondents"), used in the text derived for each column
+#   columns - for multi-column files, the metadata of each column, by column name
+
+
+# Immutable object with a fixed set of fields, given as keyword arguments
+class Config:
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+
+# Read-only dict, for the dicts held by config objects - a dict subclass rather than a types.MappingProxyType, so that it is serialized as a dict in the JSON sent to the browser and pickled for background jobs
+class FrozenDict(dict):
+    __slots__ = ()
+
+    def immutable(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is immutable")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = immutable
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+# Histogram bins and x-axis range (start, end, size), trace name, hover text (%{customdata} is the bin range) and description used for screen reader text
+class HistogramConfig(Config):
+    __slots__ = ("start", "end", "size", "name", "hovertemplate", "description")
+
+
+# Null/alternative hypothesis text, formatted with the hypothesised mean and the relation given by the alternative hypothesis
+class HypothesisConfig(Config):
+    __slots__ = ("null", "alt")
+
+
+# Relation used in the alternative hypothesis text for each alternative hypothesis
+relations = {"<": "less than",
+             ">": "greater than",
+             "!=": "NOT equal to"}
+
+
+# Hypothesised mean slider bounds, default value, step and marks, and the data description text
+class SliderConfig(Config):
+    __slots__ = ("min", "max", "value", "step", "marks", "text")
+
+
+# Settings for a dataset - outputs is the update_data_info response for it, and info the slider settings used by the clientside callbacks
+class DatasetConfig(Config):
+    __slots__ = ("dataset", "histogram", "hypothesis", "slider", "outputs", "info")
+
+
+# Round away floating point error, and return whole numbers as int so they are formatted without a decimal point (as slider values sent from the browser are)
+def tidy(x):
+    x = round(x, 10)
+    return int(x) if x == int(x) else x
+
+
+# Round a bin width up to 1, 2 or 5 times a power of 10
+def nice_size(width):
+    power = 10 ** math.floor(math.log10(width))
+    for factor in [1, 2, 5, 10]:
+        if width <= factor * power:
+            return factor * power
+
+
+# Compile the settings for a dataset from its metadata, deriving anything missing from its values - around 10 bins, with the slider covering the histogram range in steps of a fifth of a bin, starting at the sample mean. label names the measurement in the derived text, and description and text are the screen reader and data description text used if the metadata has none
+def compile_config(dataset, values, metadata, label, description, text):
+    size = tidy(nice_size((values.max() - values.min()) / 10))
+    histogram = {"start": tidy(math.floor(values.min() / size) * size),
+                 "end": tidy(math.ceil(values.max() / size) * size),
+                 "size": size,
+                 "name": label,
+                 "hover": label,
+                 "description": description,
+                 **metadata.get("histogram", {})}
+    hypothesis = {"null": f"The actual mean {label} is equal to {{hyp_mean}}",
+                  "alt": f"The actual mean {label} is {{relation}} {{hyp_mean}}",
+                  **metadata.get("hypothesis", {})}
+    slider = {"min": histogram["start"],
+              "max": histogram["end"],
+              "step": tidy(histogram["size"] / 5),
+              "mark_step": histogram["size"],
+              **metadata.get("slider", {})}
+    if "value" not in slider:
+        slider["value"] = tidy(round(values.mean() / slider["step"]) * slider["step"])
+    marks = FrozenDict({tidy(slider["min"] + i * slider["mark_step"]): FrozenDict(label=f"{tidy(slider['min'] + i * slider['mark_step'])}")
+                        for i in range(round((slider["max"] - slider["min"]) / slider["mark_step"]) + 1)})
+    slider = SliderConfig(min=slider["min"], max=slider["max"], value=slider["value"], step=slider["step"], marks=marks, text=metadata.get("text", text))
+    return DatasetConfig(dataset=dataset,
+                         histogram=HistogramConfig(start=histogram["start"],
+                                                   end=histogram["end"],
+                                                   size=histogram["size"],
+                                                   name=histogram["name"],
+                                                   hovertemplate=f"{histogram['hover']}: %{{customdata}}" + "<br>Count: %{y}<extra></extra>",
+                                                   description=histogram["description"]),
+                         hypothesis=HypothesisConfig(null=hypothesis["null"], alt=hypothesis["alt"]),
+                         slider=slider,
+                         outputs=(slider.min, slider.max, slider.value, slider.marks, slider.step, slider.text),
+                         info=FrozenDict(min=slider.min, max=slider.max, value=slider.value, step=slider.step, marks=slider.marks, text=slider.text))
+
+
+# Metadata for a dataset CSV file - empty if it has no metadata file
+def read_metadata(path):
+    try:
+        with open(path.with_suffix(".json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+# Settings compiled for each dataset under data/, on first use
+configs = {}
+# Settings derived for each uploaded dataset - bounded, as uploaded datasets are
+upload_configs = LRUCache(256)
+
+
+# Compile the settings for a dataset under data/ - a CSV file, or a column of a multi-column file ("table:column"). Raises KeyError if there is no such dataset
+def compile_dataset_config(dataset):
+    table, _, column = dataset.partition(":")
+    path = data_dir / f"{table}.csv"
+    if not path.is_file() or (column and column not in (get_measurement_columns(table) or [])) or (not column and table in dataset_columns):
+        raise KeyError(dataset)
+    metadata = read_metadata(path)
+    values = get_values(dataset)
+    if column:
+        subjects = metadata.get("subjects", "rows")
+        label = column.replace("_", " ")
+        return compile_config(dataset, values, metadata.get("columns", {}).get(column, {}), label,
+                              f"Histogram of {label} for {values.size} {subjects}",
+                              f"{values.size} {subjects} recorded their {label}. Select a column to test its mean against the hypothesised mean.")
+    label = read_csv_header(path)[0].replace("_", " ")
+    return compile_config(dataset, values, metadata, label,
+                          f"Histogram of {label} for {values.size} values",
+                          f"{values.size} values of {label} were recorded. Is their mean the same or different to the hypothesised mean?")
+
+
+# Settings for a dataset, compiled on first use - derived from the values of uploaded datasets. Raises KeyError for an unknown dataset, or an uploaded dataset that has been evicted
+def get_config(dataset):
+    config = configs.get(dataset)
+    if config is not None:
+        return config
+    if not dataset.startswith(upload_prefix):
+        config = configs[dataset] = compile_dataset_config(dataset)
+        return config
+    config = upload_configs.get(dataset)
+    if config is None:
+        upload = get_upload(dataset)
+        values = upload["values"]
+        label = upload["label"].replace("_", " ")
+        config = compile_config(dataset, values, {}, label,
+                                f"Histogram of {label} for {values.size} uploaded values",
+                                f"{values.size} values of {label} were uploaded. Is their mean the same or different to the hypothesised mean?")
+        upload_configs.put(dataset, config)
+    return config
+
+
+# Compile the settings for every dataset under data/ (each column of multi-column files) and the dataset dropdown options, in order
+def load_configs():
+    all_configs = {}
+    options = []
+    for path in sorted(data_dir.glob("*.csv")):
+        table = path.stem
+        metadata = read_metadata(path)
+        options.append((metadata.get("order", math.inf), {"label": metadata.get("label", table.replace("_", " ").capitalize()), "value": table}))
+        for column in get_measurement_columns(table) or [None]:
+            dataset = table if column is None else f"{table}:{column}"
+            all_configs[dataset] = get_config(dataset)
+    options.sort(key=lambda option: option[0])
+    return all_configs, [option for _, option in options]
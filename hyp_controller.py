@@ -1,220 +1,187 @@
-from dash import html, Input, Output, State, exceptions
-import plotly.graph_objects as go
+import base64
+import binascii
+import os
+import tempfile
+import threading
 import numpy as np
-from hyp_model import antacid, grades, rda, update_statistics, t_test_1sided, t_test_2sided
-from hyp_view import app
-
-
-# Add confidence interval lines and hypothesised mean location to graph for hypothesised mean < population mean
-def add_ci_traces_lt(fig, start, ci_upper, hyp_mean):
-    fig.add_trace(go.Scatter(x=np.linspace(start, ci_upper, 100),
-                             y=[0.5]*100,
-                             name="Confidence<br>interval",
-                             hoverinfo="skip",
-                             marker_color="#d10373"))
-    fig.add_trace(go.Scatter(x=[start],
-                             y=[0.5],
-                             hoverinfo="skip",
-                             marker_symbol="arrow-left",
-                             marker_color="#d10373",
-                             marker_size=14,
-                             showlegend=False)),
-    fig.add_trace(go.Scatter(x=[ci_upper],
-                             y=[0.5],
-                             mode="markers",
-                             hoverinfo="skip",
-                             marker_symbol="line-ns",
-                             marker_line_width=2,
-                             marker_line_color="#d10373",
-                             marker_size=12,
-                             showlegend=False)),
-    fig.add_trace(go.Scatter(x=[hyp_mean],
-                             y=[0.5],
-                             name="Hypothesised<br>mean",
-                             mode="markers",
-                             hovertemplate="Hypothesised mean: %{x}<extra></extra>",
-                             marker_symbol="circle-x-open",
-                             marker_color="#d10373",
-                             marker_size=16))
-
-
-# Add confidence interval lines and hypothesised mean location to graph for hypothesised mean > population mean
-def add_ci_traces_gt(fig, end, ci_lower, hyp_mean):
-    fig.add_trace(go.Scatter(x=np.linspace(ci_lower, end, 100),
-                             y=[0.5]*100,
-                             name="Confidence<br>interval",
-                             hoverinfo="skip",
-                             marker_color="#d10373"))
-    fig.add_trace(go.Scatter(x=[end],
-                             y=[0.5],
-                             hoverinfo="skip",
-                             marker_symbol="arrow-right",
-                             marker_color="#d10373",
-                             marker_size=14,
-                             showlegend=False)),
-    fig.add_trace(go.Scatter(x=[ci_lower],
-                             y=[0.5],
-                             mode="markers",
-                             hoverinfo="skip",
-                             marker_symbol="line-ns",
-                             marker_line_width=2,
-                             marker_line_color="#d10373",
-                             marker_size=12,
-                             showlegend=False)),
-    fig.add_trace(go.Scatter(x=[hyp_mean],
-                             y=[0.5],
-                             name="Hypothesised<br>mean",
-                             mode="markers",
-                             hovertemplate="Hypothesised mean: %{x}<extra></extra>",
-                             marker_symbol="circle-x-open",
-                             marker_color="#d10373",
-                             marker_size=16))
-
-
-# Add confidence interval lines and hypothesised mean location to graph for hypothesised mean = population mean
-def add_ci_traces_eq(fig, ci_lower, ci_upper, hyp_mean):
-    fig.add_trace(go.Scatter(x=[ci_lower, ci_upper],
-                             y=[0.5, 0.5],
-                             hoverinfo="skip",
-                             name="Confidence<br>interval",
-                             mode="lines",
-                             marker_color="#d10373"))
-    fig.add_trace(go.Scatter(x=[ci_lower],
-                             y=[0.5],
-                             mode="markers",
-                             hoverinfo="skip",
-                             marker_symbol="line-ns",
-                             marker_line_width=2,
-                             marker_line_color="#d10373",
-                             marker_size=12,
-                             showlegend=False)),
-    fig.add_trace(go.Scatter(x=[ci_upper],
-                             y=[0.5],
-                             mode="markers",
-                             hoverinfo="skip",
-                             marker_symbol="line-ns",
-                             marker_line_width=2,
-                             marker_line_color="#d10373",
-                             marker_size=12,
-                             showlegend=False)),
-    fig.add_trace(go.Scatter(x=[hyp_mean],
-                             y=[0.5],
-                             name="Hypothesised<br>mean",
-                             mode="markers",
-                             hovertemplate="Hypothesised mean: %{x}<extra></extra>",
-                             marker_symbol="circle-x-open",
-                             marker_color="#d10373",
-                             marker_size=16))
-
-# Callback function to update graph and screen reader text for selected dataset and user entry for hypothesised mean, alternative hypothesis and confidence level (alpha)
-@app.callback(
-    Output("graph", "figure"),
-    Output("sr-hist", "children"),
-    Input("submit", "n_clicks"),
-    State("dropdown", "value"),
-    State("hyp-mean", "value"),
-    State("alt-hyp-dropdown", "value"),
-    State("alpha", "value"),
-    prevent_initial_call=True
-)
-def update_histogram(n_clicks, dataset, hyp_mean, alternative, alpha):
-    if n_clicks is None:
-        raise exceptions.PreventUpdate
+from dash import html, Input, Output, State, ClientsideFunction, exceptions, no_update
+import hyp_model
+from hyp_model import dataset_columns, get_values, get_template, histogram_bars, update_statistics, t_test_1sided, t_test_2sided, t_test_sweep, hypothesis_decision, warm_t_cache, t_cache_stats, upload_prefix, max_upload_bytes, add_upload, get_upload, get_measurement_columns, dataset_key, alternatives, create_blank_fig
+# server is imported so that production servers can load the app with its callbacks registered as hyp_controller:server
+from hyp_view import app, server, alpha_marks
+from hyp_config import load_configs, get_config, relations, tidy
+import hyp_metrics
+from hyp_metrics import phase
+import hyp_store
+from hyp_cache import LRUCache
+
+# Set HYP_CLIENTSIDE=1 to compute results in the browser (assets/hyp_clientside.js) instead of on the server
+clientside = os.environ.get("HYP_CLIENTSIDE") == "1"
+# Set HYP_BACKGROUND=1 to run update_results and update_sweep as Dash background callbacks - each submission runs in its own process, with its progress and result passed back through a disk cache in HYP_BACKGROUND_DIR, so that server threads stay free for the other callbacks while it runs. A new submission, or the Cancel button shown with its progress bar, terminates the job still running. Requires diskcache, multiprocess and psutil, and is not used with HYP_CLIENTSIDE=1
+background = os.environ.get("HYP_BACKGROUND") == "1" and not clientside
+if background:
+    import diskcache
+    from dash import DiskcacheManager
+    background_manager = DiskcacheManager(diskcache.Cache(os.environ.get("HYP_BACKGROUND_DIR", os.path.join(tempfile.gettempdir(), "hyp-background"))))
+    # The browser polls for the result of a job every 250 ms
+    background_options = {"background": True,
+                          "manager": background_manager,
+                          "interval": 250}
+    # The progress bar and Cancel button are shown while a job reporting progress runs - Dash allows one job per Cancel button
+    # Jobs run in their own process, with a progress bar, so can take longer - set HYP_BACKGROUND_RESAMPLE_MAX_VALUES to change the resampling limit of hyp_model.resample_max_values for them
+    hyp_model.resample_max_values = int(os.environ.get("HYP_BACKGROUND_RESAMPLE_MAX_VALUES", 1_000_000_000))
+    progress_options = {"progress_default": [0, ""],
+                        "running": [(Output("progress-div", "style"), {"display": "flex"}, {"display": "none"})],
+                        "cancel": [Input("cancel", "n_clicks")]}
+
+
+# Register callback on the server, timed by phase when metrics are enabled. When HYP_BACKGROUND=1, job (if given) is registered as a background callback instead - it is called with the same arguments as func, after a set_progress function if progress outputs are given. Dash identifies background callbacks by their source code, so each job must be a separate function
+def server_callback(*args, job=None, progress=None, **kwargs):
+    def register(func):
+        if background and job is not None:
+            options = dict(background_options, progress=progress, **progress_options) if progress else background_options
+            app.callback(*args, **options, **kwargs)(job)
+            return func
+        if hyp_metrics.enabled:
+            return app.callback(*args, **kwargs)(hyp_metrics.timed_callback(func))
+        return app.callback(*args, **kwargs)(func)
+    return register
+
+
+# Register callback on the server (or as a background job - see server_callback), or in the browser using the function of the same name in assets/hyp_clientside.js when running in clientside mode
+def hybrid_callback(*args, job=None, progress=None, **kwargs):
+    def register(func):
+        if clientside:
+            app.clientside_callback(ClientsideFunction(namespace="hyp", function_name=func.__name__),
+                                    *args,
+                                    State("client-data", "data"),
+                                    **kwargs)
+            return func
+        return server_callback(*args, job=job, progress=progress, **kwargs)(func)
+    return register
+
+
+# Confidence interval end marker symbols and sizes for each alternative hypothesis - an arrow for an unbounded end, otherwise a vertical line
+ci_markers = {"<": (["arrow-left", "line-ns"], [14, 12]),
+              ">": (["line-ns", "arrow-right"], [12, 14]),
+              "!=": (["line-ns", "line-ns"], [12, 12])}
+
+
+# Add confidence interval line (from x_lower to x_upper) and hypothesised mean location to graph - the line and both end markers are drawn as a single two-point trace
+def add_ci_traces(fig, x_lower, x_upper, hyp_mean, alternative):
+    symbols, sizes = ci_markers[alternative]
+    fig["data"].append({"type": "scatter",
+                        "x": [x_lower, x_upper],
+                        "y": [0.5, 0.5],
+                        "name": "Confidence<br>interval",
+                        "mode": "lines+markers",
+                        "hoverinfo": "skip",
+                        "line": {"color": "#d10373"},
+                        "marker": {"symbol": symbols,
+                                   "size": sizes,
+                                   "color": "#d10373",
+                                   "line": {"width": 2, "color": "#d10373"}}})
+    fig["data"].append({"type": "scatter",
+                        "x": [hyp_mean],
+                        "y": [0.5],
+                        "name": "Hypothesised<br>mean",
+                        "mode": "markers",
+                        "hovertemplate": "Hypothesised mean: %{x}<extra></extra>",
+                        "marker": {"symbol": "circle-x-open",
+                                   "color": "#d10373",
+                                   "size": 16}})
+
+
+# Number of hypothesised means the p value and power curves are computed for
+sweep_points = 501
+
+
+# Settings for each dataset (see hyp_config), compiled at startup, and the dataset dropdown options - this loads every bundled dataset, as their base figures are part of the page layout. hyp_model and hyp_config on their own load and compile each dataset on first use
+configs, dataset_options = load_configs()
+# Dataset shown when the page loads - the first in the dropdown, or its first column
+default_dataset = dataset_key(dataset_options[0]["value"], None)
+
+
+# Add histogram of the selected dataset to graph - drawn as one bar per bin from bin counts computed on the server, so the figure is the same size whatever the sample size
+def add_histogram(fig, dataset):
+    settings = get_config(dataset).histogram
+    fig["layout"].update(margin=dict(t=20, b=10, l=20, r=20),
+                         height=400,
+                         font={"size": 14},
+                         dragmode=False,
+                         xaxis={"range": [settings.start, settings.end]})
+    fig["data"].append({"type": "bar",
+                        **histogram_bars(dataset, settings.start, settings.end, settings.size),
+                        "name": settings.name,
+                        "hovertemplate": settings.hovertemplate,
+                        "marker": {"color": "rgba(158,171,5,0.5)",
+                                   "line": {"color": "rgba(158,171,5,1)", "width": 1}}})
+
+
+# Build base figure (histogram without confidence interval) for the selected dataset - the figure template is sent separately, once for all datasets
+def create_base_figure(dataset):
+    fig = {"data": [], "layout": {}}
+    add_histogram(fig, dataset)
+    return fig
+
+
+# Build confidence interval traces and screen reader text for selected dataset and user entry for hypothesised mean, alternative hypothesis, confidence level (alpha) and test method - the traces are added to the base figure in the browser
+def update_histogram(dataset, hyp_mean, alternative, alpha, method="t"):
+    settings = get_config(dataset).histogram
+    with phase("stats"):
+        fig, conf_int = update_statistics(dataset, alternative, alpha, method)
+    if alternative == "<":
+        with phase("figure"):
+            add_ci_traces(fig, settings.start, conf_int[1], hyp_mean, alternative)
+        # Screen reader text
+        sr_text = f"{settings.description} with upper bound for population mean of {conf_int[1]:.3f} and hypothesised mean of {hyp_mean}"
+    elif alternative == ">":
+        with phase("figure"):
+            add_ci_traces(fig, conf_int[0], settings.end, hyp_mean, alternative)
+        # Screen reader text
+        sr_text = f"{settings.description} with lower bound for population mean of {conf_int[0]:.3f} and hypothesised mean of {hyp_mean}"
     else:
-        if dataset == "antacid":
-            # Bins and x-axis start/end, bin size
-            start = 3
-            end = 17
-            size = 2
-            fig, conf_int = update_statistics(antacid, alternative, alpha)
-            fig.update_layout(margin=dict(t=20, b=10, l=20, r=20),
-                              height=400,
-                              font_size=14,
-                              dragmode=False)
-            fig.add_trace(go.Histogram(x=antacid,
-                                       xbins={"start": start, "end": end, "size": size},
-                                       name="Time to take<br>effect (mins)",
-                                       hovertemplate="Time (mins): %{x}" + "<br>Count: %{y}<extra></extra>",
-                                       marker_line_color="rgba(158,171,5,1)",
-                                       marker_color="rgba(158,171,5,0.5)",
-                                       marker_line_width=1))
-            fig.update_xaxes(range=[start, end])
-            if alternative == "<":
-                add_ci_traces_lt(fig, start, conf_int[1], hyp_mean)
-                # Screen reader text
-                sr_text = f"Histogram of times for relief for new antacid tablet with upper bound for population mean of {conf_int[1]:.3f} and hypothesised mean of {hyp_mean}"
-            elif alternative == ">":
-                add_ci_traces_gt(fig, end, conf_int[0], hyp_mean)
-                # Screen reader text
-                sr_text = f"Histogram of times for relief for new antacid tablet with lower bound for population mean of {conf_int[0]:.3f} and hypothesised mean of {hyp_mean}"
-            else:
-                add_ci_traces_eq(fig, conf_int[0], conf_int[1], hyp_mean)
-                # Screen reader text
-                sr_text = f"Histogram of times for relief for new antacid tablet with confidence interval ({conf_int[0]:.3f}, {conf_int[1]:.3f}) and hypothesised mean of {hyp_mean}"
-        elif dataset == "grades":
-            # Bins and x-axis start/end, bin size
-            start = 75
-            end = 100
-            size = 5
-            fig, conf_int = update_statistics(grades, alternative, alpha)
-            fig.update_layout(margin=dict(t=20, b=10, l=20, r=20),
-                              height=400,
-                              font_size=14,
-                              dragmode=False)
-            fig.add_trace(go.Histogram(x=grades,
-                                       xbins={"start": start, "end": end, "size": size},
-                                       name="Grade",
-                                       hovertemplate="Grade: %{x}" + "<br>Count: %{y}<extra></extra>",
-                                       marker_line_color="rgba(158,171,5,1)",
-                                       marker_color="rgba(158,171,5,0.5)",
-                                       marker_line_width=1))
-            fig.update_xaxes(range=[start, end])
-            if alternative == "<":
-                add_ci_traces_lt(fig, start, conf_int[1], hyp_mean)
-                # Screen reader text
-                sr_text = f"Histogram of the grades of 30 students with upper bound for population mean of {conf_int[1]:.3f} and hypothesised mean of {hyp_mean}"
-            elif alternative == ">":
-                add_ci_traces_gt(fig, end, conf_int[0], hyp_mean)
-                # Screen reader text
-                sr_text = f"Histogram of the grades of 30 students with lower bound for population mean of {conf_int[0]:.3f} and hypothesised mean of {hyp_mean}"
-            else:
-                add_ci_traces_eq(fig, conf_int[0], conf_int[1], hyp_mean)
-                # Screen reader text
-                sr_text = f"Histogram of the grades of 30 students with confidence interval ({conf_int[0]:.3f}, {conf_int[1]:.3f}) and hypothesised mean of {hyp_mean}"
-        elif dataset =="rda":
-            # Bins and x-axis start/end, bin size
-            start = 5
-            end = 21
-            size = 2
-            fig, conf_int = update_statistics(rda, alternative, alpha)
-            fig.update_layout(margin=dict(t=20, b=10, l=20, r=20),
-                              height=400,
-                              font_size=14,
-                              dragmode=False)
-            fig.add_trace(go.Histogram(x=rda,
-                                       xbins={"start": start, "end": end, "size": size},
-                                       name="Daily iron<br>intake (mg)",
-                                       hovertemplate="RDA (mg): %{x}" + "<br>Count: %{y}<extra></extra>",
-                                       marker_line_color="rgba(158,171,5,1)",
-                                       marker_color="rgba(158,171,5,0.5)",
-                                       marker_line_width=1))
-            fig.update_xaxes(range=[start, end])
-            if alternative == "<":
-                add_ci_traces_lt(fig, start, conf_int[1], hyp_mean)
-                # Screen reader text
-                sr_text = f"Histogram of iron intake for 45 randomly selected females aged under 51 with upper bound for population mean of {conf_int[1]:.3f} and hypothesised mean of {hyp_mean}"
-            elif alternative == ">":
-                add_ci_traces_gt(fig, end, conf_int[0], hyp_mean)
-                # Screen reader text
-                sr_text = f"Histogram of iron intake for 45 randomly selected females aged under 51 with lower bound for population mean of {conf_int[0]:.3f} and hypothesised mean of {hyp_mean}"
-            else:
-                add_ci_traces_eq(fig, conf_int[0], conf_int[1], hyp_mean)
-                # Screen reader text
-                sr_text = f"Histogram of iron intake for 45 randomly selected females aged under 51 with confidence interval ({conf_int[0]:.3f}, {conf_int[1]:.3f}) and hypothesised mean of {hyp_mean}"
-        return fig, sr_text
-
-# Callback function to generate natural language versions of the null/alternative hypothesis for the selected data set and display the p-value and confidence interval results
-@app.callback(
+        with phase("figure"):
+            add_ci_traces(fig, conf_int[0], conf_int[1], hyp_mean, alternative)
+        # Screen reader text
+        sr_text = f"{settings.description} with confidence interval ({conf_int[0]:.3f}, {conf_int[1]:.3f}) and hypothesised mean of {hyp_mean}"
+    ci_traces = {"dataset": dataset, "traces": fig["data"]}
+    return ci_traces, sr_text
+
+
+# Generate natural language versions of the null/alternative hypothesis for the selected data set and the p-value and confidence interval results
+def perform_t_test(dataset, hyp_mean, alternative, alpha, method="t"):
+    hypothesis = get_config(dataset).hypothesis
+    null_hyp = hypothesis.null.format(hyp_mean=hyp_mean)
+    alt_hyp = hypothesis.alt.format(hyp_mean=hyp_mean, relation=relations[alternative])
+    with phase("stats"):
+        if alternative == "<":
+            p, conf_text, conf_val = t_test_1sided(dataset, hyp_mean, "less", alpha, method)
+        elif alternative == ">":
+            p, conf_text, conf_val = t_test_1sided(dataset, hyp_mean, "greater", alpha, method)
+        else:
+            p, conf_text, conf_val = t_test_2sided(dataset, hyp_mean, alpha, method)
+    return null_hyp, alt_hyp, p, conf_text, conf_val
+
+
+# Labels of the progress bar for each resampling function
+progress_labels = {hyp_model.bootstrap_chunk: "Bootstrap confidence interval",
+                   hyp_model.sign_flip_chunk: "Permutation test"}
+
+
+# Run update_results as a background job, reporting the progress of the resampling - the t-test is too quick to report on
+def update_results_job(set_progress, *args):
+    hyp_model.progress.report = lambda func, fraction: set_progress((100 * fraction, f"{progress_labels[func]}: {fraction:.0%}"))
+    try:
+        return update_results(*args)
+    finally:
+        hyp_model.progress.report = None
+
+
+# Callback function to update confidence interval traces, screen reader text, null/alternative hypothesis and p-value and confidence interval results for selected dataset and user entry for hypothesised mean, alternative hypothesis, confidence level (alpha) and test method. A single callback is used so that each click is one request to the server
+@hybrid_callback(
+    Output("ci-store", "data"),
+    Output("sr-hist", "children"),
     Output("null-hyp", "children"),
     Output("alt-hyp", "children"),
     Output("p-value", "children"),
@@ -225,55 +192,153 @@ def update_histogram(n_clicks, dataset, hyp_mean, alternative, alpha):
     Output("results", "style"),
     # Hide Conclusion feedback whenever callback triggered
     Output("accept-reject", "value"),
+    # Shown instead of the results when the test cannot be run
+    Output("results-message", "children"),
     Input("submit", "n_clicks"),
     State("dropdown", "value"),
+    State("column", "value"),
     State("hyp-mean", "value"),
     State("alt-hyp-dropdown", "value"),
     State("alpha", "value"),
-    prevent_initial_call=True
+    State("method", "value"),
+    prevent_initial_call=True,
+    job=update_results_job,
+    progress=[Output("progress", "value"), Output("progress", "label")]
 )
-def perform_t_test(n_clicks, dataset, hyp_mean, alternative, alpha):
+def update_results(n_clicks, dataset, column, hyp_mean, alternative, alpha, method):
     if n_clicks is None:
         raise exceptions.PreventUpdate
     else:
-        if dataset == "antacid":
-            null_hyp = f"The actual mean time to relief for the new tablet is {hyp_mean} minutes"
-            if alternative == "<":
-                p, conf_text, conf_val = t_test_1sided(antacid, hyp_mean, "less", alpha)
-                alt_hyp = f"The actual mean time to relief for the new tablet is less than {hyp_mean} minutes"
-            elif alternative == ">":
-                p, conf_text, conf_val = t_test_1sided(antacid, hyp_mean, "greater", alpha)
-                alt_hyp = f"The actual mean time to relief for the new tablet is greater than {hyp_mean} minutes"
-            else:
-                p, conf_text, conf_val = t_test_2sided(antacid, hyp_mean, alpha)
-                alt_hyp = f"The actual mean time to relief for the new tablet is NOT equal to {hyp_mean} minutes"
-        elif dataset == "grades":
-            null_hyp = f"The actual mean grade is equal to {hyp_mean}"
-            if alternative == "<":
-                p, conf_text, conf_val = t_test_1sided(grades, hyp_mean, "less", alpha)
-                alt_hyp = f"The actual mean grade is less than {hyp_mean}"
-            elif alternative == ">":
-                p, conf_text, conf_val = t_test_1sided(grades, hyp_mean, "greater", alpha)
-                alt_hyp = f"The actual mean grade is greater than {hyp_mean}"
-            else:
-                p, conf_text, conf_val = t_test_2sided(grades, hyp_mean, alpha)
-                alt_hyp = f"The actual mean grade is NOT equal to {hyp_mean}"
-        elif dataset == "rda":
-            null_hyp = f"The actual mean intake of iron is equal to {hyp_mean} milligrams"
-            if alternative == "<":
-                p, conf_text, conf_val = t_test_1sided(rda, hyp_mean, "less", alpha)
-                alt_hyp = f"The actual mean intake of iron is less than {hyp_mean} milligrams"
-            elif alternative == ">":
-                p, conf_text, conf_val = t_test_1sided(rda, hyp_mean, "greater", alpha)
-                alt_hyp = f"The actual mean intake of iron is greater than {hyp_mean} milligrams"
-            else:
-                p, conf_text, conf_val = t_test_2sided(rda, hyp_mean, alpha)
-                alt_hyp = f"The actual mean intake of iron is NOT equal to {hyp_mean} milligrams"
-        return null_hyp, alt_hyp, f"{p:.3f} ({p:.1%})", p, conf_text, conf_val, {"display": "inline"}, None
+        dataset = dataset_key(dataset, column)
+        try:
+            ci_traces, sr_text = update_histogram(dataset, hyp_mean, alternative, alpha, method)
+            null_hyp, alt_hyp, p, conf_text, conf_val = perform_t_test(dataset, hyp_mean, alternative, alpha, method)
+        except KeyError:
+            if not dataset.startswith(upload_prefix):
+                raise
+            # Uploaded dataset that has since been evicted to make room for others
+            return no_update, "", "", "", "", None, "", "", {"display": "none"}, None, "This uploaded data set is no longer available - please upload the file again"
+        except ValueError as error:
+            if method == "t":
+                raise
+            # Sample too large to resample
+            return no_update, "", "", "", "", None, "", "", {"display": "none"}, None, str(error)
+        return ci_traces, sr_text, null_hyp, alt_hyp, f"{p:.3f} ({p:.1%})", p, conf_text, conf_val, {"display": "inline"}, None, ""
+
+
+# Clientside callback function to draw graph from the base figure for the selected dataset and the confidence interval traces, so that only the traces are sent from the server for each submission
+app.clientside_callback(
+    ClientsideFunction(namespace="hyp", function_name="draw_figure"),
+    Output("graph", "figure"),
+    Input("ci-store", "data"),
+    State("figures", "data"),
+    State("upload-figures", "data"),
+    prevent_initial_call=True
+)
+
+
+# p value curve for every hypothesised mean across the slider's range, and power curve of the test of the selected hypothesised mean for every population mean across it, computed in one vectorized pass, with the significance level and the selected hypothesised mean - returns the traces and layout (drawn in the browser with the figure template) and screen reader text
+def create_sweep(dataset, hyp_mean, alternative, alpha, method="t"):
+    info = get_config(dataset).slider
+    with phase("stats"):
+        results = t_test_sweep(dataset, np.linspace(info.min, info.max, sweep_points), alternatives[alternative], alpha, hyp_mean, method)
+    with phase("figure"):
+        hyp_means = np.round(results["hyp_mean"], 10)
+        significance = tidy(1 - alpha)
+        sweep = {"data": [{"type": "scatter",
+                           "x": hyp_means,
+                           "y": np.round(results["p"], 6),
+                           "customdata": np.round(results["t"], 4),
+                           "name": "P value" if method == "t" else "Permutation<br>test p value",
+                           "mode": "lines",
+                           "hovertemplate": "Hypothesised mean: %{x:.3f}<br>t: %{customdata}<br>P value: %{y:.3f}<extra></extra>",
+                           "line": {"color": "#d10373"}},
+                          {"type": "scatter",
+                           "x": hyp_means,
+                           "y": np.round(results["power"], 6),
+                           "name": "Power" if method == "t" else "t-test power",
+                           "mode": "lines",
+                           "hovertemplate": f"Population mean: %{{x:.3f}}<br>Power of the t-test of {hyp_mean}: %{{y:.3f}}<extra></extra>",
+                           "line": {"color": "#0085a1"}},
+                          {"type": "scatter",
+                           "x": [info.min, info.max],
+                           "y": [significance, significance],
+                           "name": "Significance<br>level",
+                           "mode": "lines",
+                           "hoverinfo": "skip",
+                           "line": {"color": "#424a52", "dash": "dash", "width": 1}},
+                          {"type": "scatter",
+                           "x": [hyp_mean, hyp_mean],
+                           "y": [0, 1],
+                           "name": "Hypothesised<br>mean",
+                           "mode": "lines",
+                           "hoverinfo": "skip",
+                           "line": {"color": "#d10373", "dash": "dot", "width": 1}}],
+                 "layout": {"margin": dict(t=20, b=10, l=20, r=20),
+                            "height": 300,
+                            "font": {"size": 14},
+                            "dragmode": False,
+                            "xaxis": {"range": [info.min, info.max], "title": {"text": "Hypothesised or population mean"}},
+                            "yaxis": {"range": [0, 1.02], "title": {"text": "Probability"}}}}
+    accepted = hyp_means[results["p"] >= 1 - alpha]
+    test = "t-test" if method == "t" else "permutation test"
+    sr_text = f"{test.capitalize()} p value for hypothesised means from {info.min} to {info.max}, and power of the t-test of a hypothesised mean of {hyp_mean} for population means across the same range. "
+    if accepted.size:
+        sr_text += f"The null hypothesis is accepted at the {alpha:.0%} confidence level for hypothesised means from {accepted.min():.3f} to {accepted.max():.3f}"
+    else:
+        sr_text += f"The null hypothesis is rejected at the {alpha:.0%} confidence level for every hypothesised mean"
+    return sweep, sr_text
+
+
+# Run update_sweep as a background job
+def update_sweep_job(*args):
+    return update_sweep(*args)
+
+
+# Callback function to update the p value and power curves when results are submitted with the sweep switch on, so that one request shows the results for every hypothesised mean - always a server callback, as it uses SciPy's noncentral t distribution
+@server_callback(
+    Output("sweep-store", "data"),
+    Output("sweep-div", "style"),
+    Output("sr-sweep", "children"),
+    Input("submit", "n_clicks"),
+    Input("sweep", "value"),
+    State("dropdown", "value"),
+    State("column", "value"),
+    State("hyp-mean", "value"),
+    State("alt-hyp-dropdown", "value"),
+    State("alpha", "value"),
+    State("method", "value"),
+    prevent_initial_call=True,
+    job=update_sweep_job
+)
+def update_sweep(n_clicks, sweep, dataset, column, hyp_mean, alternative, alpha, method):
+    if not sweep or not n_clicks:
+        return no_update, {"display": "none"}, ""
+    try:
+        sweep_data, sr_text = create_sweep(dataset_key(dataset, column), hyp_mean, alternative, alpha, method)
+    except KeyError:
+        # Uploaded dataset that has since been evicted - update_results asks for the file again
+        return no_update, {"display": "none"}, ""
+    except ValueError:
+        if method == "t":
+            raise
+        # Sample too large to resample - update_results shows why
+        return no_update, {"display": "none"}, ""
+    return sweep_data, {"display": "block", "margin": "10px"}, sr_text
+
+
+# Clientside callback function to draw the p value and power curves with the figure template
+app.clientside_callback(
+    ClientsideFunction(namespace="hyp", function_name="draw_sweep"),
+    Output("sweep-graph", "figure"),
+    Input("sweep-store", "data"),
+    State("figures", "data"),
+    prevent_initial_call=True
+)
 
 
 # Callback function to give feedback when user decides whether to accept/reject the null hypothesis based on the calculated p-value
-@app.callback(
+@hybrid_callback(
     Output("conclusion", "children"),
     Input("accept-reject", "value"),
     State("p-store", "data"),
@@ -281,89 +346,210 @@ def perform_t_test(n_clicks, dataset, hyp_mean, alternative, alpha):
     prevent_initial_call=True
 )
 def accept_or_reject(accept_reject, p, alpha):
-    if accept_reject is None:
+    # No p value when the last submission could not be tested
+    if accept_reject is None or p is None:
         return ""
     else:
-        if accept_reject == "reject":
-            if p < 1 - alpha:
-                conclusion = [html.Span("Correct", className="bold-p"), html.Span(children=[f" - {p:.3f} is less than {(1-alpha):.2f}, so we reject the null hypothesis at the {alpha:.0%} confidence level"])]
-            else:
-                conclusion = [html.Span("Incorrect", className="bold-p"), html.Span(children=[f" - {p:.3f} is greater than {(1-alpha):.2f}, so we accept the null hypothesis at the {alpha:.0%} confidence level"])]
-        elif accept_reject == "accept":
-            if p < 1 - alpha:
-                conclusion = [html.Span("Incorrect", className="bold-p"), html.Span(children=[f" - {p:.3f} is less than {(1-alpha):.2f}, so we reject the null hypothesis at the {alpha:.0%} confidence level"])]
-            else:
-                conclusion = [html.Span("Correct", className="bold-p"), html.Span(children=[f" - {p:.3f} is greater than {(1-alpha):.2f}, so we accept the null hypothesis at the {alpha:.0%} confidence level"])]
+        decision, reason = hypothesis_decision(p, alpha)
+        conclusion = [html.Span("Correct" if accept_reject == decision else "Incorrect", className="bold-p"), html.Span(children=[reason])]
         return conclusion
 
 
 # Callback function to update hypothesised mean slider based on selected dataset, so that user entered values give sensible results. Also updates data description text
-@app.callback(
+@hybrid_callback(
     Output("hyp-mean", "min"),
     Output("hyp-mean", "max"),
     Output("hyp-mean", "value"),
     Output("hyp-mean", "marks"),
+    Output("hyp-mean", "step"),
     Output("data-text", "children"),
+    Input("dropdown", "value"),
+    Input("column", "value")
+)
+def update_data_info(dataset, column):
+    try:
+        return get_config(dataset_key(dataset, column)).outputs
+    except KeyError:
+        # Uploaded dataset that has since been evicted - update_results asks for the file again
+        raise exceptions.PreventUpdate
+
+
+# Callback function to update the column picker for the selected dataset - only shown for multi-column datasets
+@hybrid_callback(
+    Output("column", "options"),
+    Output("column", "value"),
+    Output("column-div", "style"),
     Input("dropdown", "value")
 )
-def update_data_info(dataset):
-    if dataset == "grades":
-        hyp_min = 75
-        hyp_max = 100
-        hyp_mean = 80
-        marks = {75: {"label": "75"},
-                 80: {"label": "80"},
-                 85: {"label": "85"},
-                 90: {"label": "90"},
-                 95: {"label": "95"},
-                 100: {"label": "100"}}
-        text = "The grades of 30 students who took a test were recorded. The mean grade for previous tests was 80. Is the mean grade for the observed 30 students the same or different to the mean for previous tests?"
-    elif dataset == "antacid":
-        hyp_min = 3
-        hyp_max = 17
-        hyp_mean = 12
-        marks = {3: {"label": "3"},
-                 4: {"label": "4"},
-                 5: {"label": "5"},
-                 6: {"label": "6"},
-                 7: {"label": "7"},
-                 8: {"label": "8"},
-                 9: {"label": "9"},
-                 10: {"label": "10"},
-                 11: {"label": "11"},
-                 12: {"label": "12"},
-                 13: {"label": "13"},
-                 14: {"label": "14"},
-                 15: {"label": "15"},
-                 16: {"label": "16"},
-                 17: {"label": "17"}}
-        text = "A chemist working for a pharmaceutical company has developed a new antacid tablet that she feels will relieve pain more quickly than the company's present tablet. Experience indicates that the present tablet requires an average of 12 minutes to take effect. The chemist records 15 times to relief with the new tablet. Does the new tablet work more quickly than the present tablet?"
-    elif dataset == "rda":
-        hyp_min = 5
-        hyp_max = 21
-        hyp_mean = 18
-        marks = {5: {"label": "5"},
-                 6: {"label": "6"},
-                 7: {"label": "7"},
-                 8: {"label": "8"},
-                 9: {"label": "9"},
-                 10: {"label": "10"},
-                 11: {"label": "11"},
-                 12: {"label": "12"},
-                 13: {"label": "13"},
-                 14: {"label": "14"},
-                 15: {"label": "15"},
-                 16: {"label": "16"},
-                 17: {"label": "17"},
-                 18: {"label": "18"},
-                 19: {"label": "19"},
-                 20: {"label": "20"},
-                 21: {"label": "21"}}
-        text = "The Food and Nutrition Authority of the National Academy of Sciences states that the Recommended Daily Amount (RDA) of iron for adult females under the age of 51 should be 18 milligrams (mg). Iron intakes, in mg, were obtained for a randomly selected group of 45 adult females under the age of 51, during a 24-hour period. Do adult females get less than the RDA of 18mg of iron?"
-    return hyp_min, hyp_max, hyp_mean, marks, text
+def update_columns(dataset):
+    columns = get_measurement_columns(dataset)
+    if columns is None:
+        return [], None, {"display": "none"}
+    return [{"label": column.replace("_", " "), "value": column} for column in columns], columns[0], {"display": "block"}
+
+
+# Values and text for a dataset, as used by the clientside callbacks
+def client_data_entry(dataset):
+    config = get_config(dataset)
+    return {"values": get_values(dataset),
+            "start": config.histogram.start,
+            "end": config.histogram.end,
+            "description": config.histogram.description,
+            "null_hyp": config.hypothesis.null,
+            "alt_hyp": config.hypothesis.alt,
+            "relations": relations,
+            "info": config.info}
+
+
+# Dataset values and text for each dataset - sent to the browser once when running in clientside mode
+def create_client_data():
+    client_data = {dataset: {"columns": get_measurement_columns(dataset)} for dataset in dataset_columns}
+    for dataset in configs:
+        client_data[dataset] = client_data_entry(dataset)
+    return client_data
+
+
+# Outputs and states of upload_dataset - in clientside mode, the uploaded values are also added to the client data
+upload_outputs = [Output("dropdown", "options"),
+                  Output("dropdown", "value"),
+                  Output("upload-figures", "data"),
+                  Output("upload-status", "children")]
+upload_states = [State("upload", "filename"),
+                 State("dropdown", "options"),
+                 State("upload-figures", "data")]
+if clientside:
+    upload_outputs.append(Output("client-data", "data"))
+    upload_states.append(State("client-data", "data"))
+
+
+# Callback function to add an uploaded CSV file to the dataset dropdown and select it - the file is parsed and summarised on the server, and its base figure sent to the browser. Always a server callback, as the file has to be validated
+@server_callback(
+    *upload_outputs,
+    Input("upload", "contents"),
+    *upload_states,
+    prevent_initial_call=True
+)
+def upload_dataset(contents, filename, options, figures, client_data=None):
+    if contents is None:
+        raise exceptions.PreventUpdate
+    # contents is a data URL - "data:<type>;base64,<data>"
+    data = contents.partition(",")[2]
+    try:
+        # Checked before decoding, as base64 is 4 characters for every 3 bytes
+        if len(data) * 3 // 4 > max_upload_bytes + 2:
+            raise ValueError(f"The file is larger than the {max_upload_bytes // 1024} KB limit")
+        dataset = add_upload(base64.b64decode(data))
+    except (ValueError, binascii.Error) as error:
+        message = html.Span(f"{filename}: {error}", className="upload-error")
+        return (no_update, no_update, no_update, message) + ((no_update,) if clientside else ())
+    try:
+        figure = create_base_figure(dataset)
+    except (ValueError, ArithmeticError):
+        # Values that pass parse_upload but whose histogram bins cannot be derived
+        message = html.Span(f"{filename}: The values cannot be drawn as a histogram", className="upload-error")
+        return (no_update, no_update, no_update, message) + ((no_update,) if clientside else ())
+    if not any(option["value"] == dataset for option in options):
+        options = options + [{"label": filename, "value": dataset}]
+    figures = dict(figures or {}, **{dataset: figure})
+    message = f"{filename}: {get_upload(dataset)['values'].size} values uploaded"
+    if clientside:
+        return options, dataset, figures, message, dict(client_data or {}, **{dataset: client_data_entry(dataset)})
+    return options, dataset, figures, message
+
+
+# Base figure for each dataset, built and serialized once at startup - the graph is drawn in the browser from these and the confidence interval traces sent for each submission
+base_figures = {dataset: create_base_figure(dataset) for dataset in configs}
+
+app.layout["dropdown"].options = dataset_options
+app.layout["dropdown"].value = dataset_options[0]["value"]
+app.layout["graph"].figure = create_blank_fig(default_dataset, configs[default_dataset].histogram)
+app.layout["figures"].data = {"template": get_template(), "figures": base_figures}
+app.layout["method-text"].children = (f"Resampling draws up to {hyp_model.resamples:,} resamples, fewer for samples of more than {hyp_model.resample_max_values // hyp_model.resamples:,} values, "
+                                      f"and is limited to samples of {hyp_model.max_resample_size():,} values")
+if clientside:
+    app.layout["client-data"].data = create_client_data()
+    # The browser only runs the t-test
+    app.layout["method-div"].style = {"display": "none"}
+
+# Serialized update_results responses, keyed on (dataset, hyp_mean, alternative, alpha, method) - set HYP_RESPONSE_CACHE_SIZE to change the number kept, or to 0 to disable the cache. The default holds every slider position for every dataset
+response_cache = LRUCache(int(os.environ.get("HYP_RESPONSE_CACHE_SIZE", 8192)))
+# Responses are built from the cached results, so are cleared with them
+hyp_model.clear_hooks.append(response_cache.clear)
+# Dash callback id of update_results - the output ids and properties, joined by "..."
+results_callback_id = next(callback_id for callback_id in app.callback_map if callback_id.startswith("..ci-store.data..."))
+
+
+# Wrap Dash's handler for update_results so that identical submissions are served from response_cache - the response only depends on the selected dataset, hypothesised mean, alternative hypothesis, confidence level and test method, not on the number of clicks
+# This relies on Dash internals (checked against Dash 2.6.1): the handler is stored as app.callback_map[id]["callback"] and called with the callback's arguments and an outputs_list keyword argument. If a Dash upgrade changes either, set HYP_RESPONSE_CACHE_SIZE=0 to run without the cache, and compare with python hyp_benchmark.py --callbacks --no-response-cache
+def cache_results_response(handler):
+    def cached(n_clicks, dataset, column, hyp_mean, alternative, alpha, method, **kwargs):
+        # Uploaded datasets are not cached, so that they cannot evict the responses for the built-in datasets
+        if n_clicks is None or dataset.startswith(upload_prefix):
+            return handler(n_clicks, dataset, column, hyp_mean, alternative, alpha, method, **kwargs)
+        # str() so that hypothesised means such as 12 and 12.0, which are shown differently, are cached separately
+        key = (dataset_key(dataset, column), str(hyp_mean), alternative, str(alpha), method)
+        response = response_cache.get(key)
+        if response is None:
+            response = handler(n_clicks, dataset, column, hyp_mean, alternative, alpha, method, **kwargs)
+            response_cache.put(key, response)
+        return response
+    cached.__name__ = handler.__name__
+    return cached
+
+
+# Background callback responses are job ids and progress rather than results, so are not cached
+if "callback" in app.callback_map[results_callback_id] and response_cache.maxsize > 0 and not background:
+    app.callback_map[results_callback_id]["callback"] = cache_results_response(app.callback_map[results_callback_id]["callback"])
+# Handler used to warm the response cache - taken before the metrics instrumentation so that warming does not add to the phase timings
+results_handler = None if background else app.callback_map[results_callback_id].get("callback")
+
+# Report the t-test and response cache counters and the memory used by the worker alongside the callback timings
+if hyp_metrics.enabled:
+    hyp_metrics.gauges[("hyp_t_cache", "Hits, misses and size of the t-test caches")] = lambda: {
+        (("cache", cache), ("stat", stat)): value for cache, stats in t_cache_stats().items() for stat, value in stats.items()}
+    hyp_metrics.gauges[("hyp_response_cache", "Hits, misses, evictions and size of the update_results response cache")] = lambda: {
+        (("stat", stat),): value for stat, value in response_cache.stats().items()}
+    hyp_metrics.gauges[("hyp_memory_bytes", "Memory used by this worker process - resident, proportional share, shared and private pages, and the size of the shared dataset store arrays it maps")] = lambda: {
+        (("kind", kind),): value for kind, value in hyp_store.memory_usage().items()}
+    hyp_metrics.instrument_app(app)
+
+
+# Hypothesised mean slider positions for a dataset
+def slider_values(slider):
+    return [tidy(slider.min + i * slider.step) for i in range(round((slider.max - slider.min) / slider.step) + 1)]
+
+
+# Precompute the t-test update_results response for every dataset, hypothesised mean slider position, alternative hypothesis and confidence level slider position
+def warm_response_cache():
+    if results_handler is None:
+        return
+    outputs_list = [{"id": output.split(".")[0], "property": output.split(".")[1]} for output in results_callback_id.strip(".").split("...")]
+    for dataset, config in configs.items():
+        table, _, column = dataset.partition(":")
+        for hyp_mean in slider_values(config.slider):
+            for alternative in relations:
+                for alpha in alpha_marks:
+                    results_handler(1, table, column or None, hyp_mean, alternative, alpha, "t", outputs_list=outputs_list)
+
+
+# Precompute the t-test results for every hypothesised mean and confidence level slider position, so that submissions are served from the cache, and run one sweep. Set HYP_WARM_RESPONSES=1 to also precompute every update_results response
+def warm_caches():
+    for dataset, config in configs.items():
+        warm_t_cache(dataset, slider_values(config.slider), alpha_marks)
+    # Imports SciPy's noncentral t distribution and splines, so that the first sweep is not slowed down by them
+    slider = configs[default_dataset].slider
+    t_test_sweep(default_dataset, np.linspace(slider.min, slider.max, sweep_points), "two-sided", 0.95, slider.value)
+    if os.environ.get("HYP_WARM_RESPONSES") == "1":
+        warm_response_cache()
+
 
+# Set HYP_WARM_CACHE to "startup" to warm the caches before serving, "off" to skip warming, or leave unset to warm them in a background thread so that the server starts without waiting for SciPy to be imported
+warm_cache = os.environ.get("HYP_WARM_CACHE", "background")
+if warm_cache == "startup":
+    warm_caches()
+elif warm_cache == "background":
+    threading.Thread(target=warm_caches, name="warm-caches", daemon=True).start()
 
 if __name__ == "__main__":
+    # Development server only - in production, run gunicorn hyp_controller:server (see gunicorn.conf.py)
     app.run(debug=True)
-    # To deploy on Docker, replace app.run(debug=True) with the following:
-    # app.run(debug=False, host="0.0.0.0", port=8080, dev_tools_ui=False)
@@ -0,0 +1,98 @@
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+port = 8072
+# Values for the submission callback's states - the dataset, hypothesised mean and alternative hypothesis are varied per request
+submissions = [(dataset, hyp_mean, alternative)
+               for dataset, hyp_means in [("antacid", range(8, 17)), ("grades", range(70, 91)), ("rda", range(14, 23))]
+               for hyp_mean in hyp_means
+               for alternative in ["<", ">", "!="]]
+
+
+# Request body for the submit button callback, built from the app's callback dependencies
+def submit_bodies(connection):
+    connection.request("GET", "/_dash-dependencies")
+    dependencies = json.loads(connection.getresponse().read())
+    callback = next(d for d in dependencies if any(i["id"] == "submit" for i in d["inputs"]))
+    outputs = [{"id": o.split(".")[0], "property": o.split(".")[1]} for o in callback["output"].strip(".").split("...")]
+    bodies = []
+    for dataset, hyp_mean, alternative in submissions:
+        values = {"dropdown": dataset, "column": None, "hyp-mean": hyp_mean, "alt-hyp-dropdown": alternative, "alpha": 0.95, "method": "t"}
+        bodies.append(json.dumps({"output": callback["output"],
+                                  "outputs": outputs,
+                                  "inputs": [{"id": "submit", "property": "n_clicks", "value": 1}],
+                                  "changedPropIds": ["submit.n_clicks"],
+                                  "state": [dict(s, value=values[s["id"]]) for s in callback["state"]]}))
+    return bodies
+
+
+# Client process - send submissions over one keep-alive connection until the deadline and return the number of successful responses
+def run_client(deadline):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    bodies = submit_bodies(connection)
+    headers = {"Content-Type": "application/json"}
+    count = 0
+    while time.time() < deadline:
+        connection.request("POST", "/_dash-update-component", body=bodies[count % len(bodies)], headers=headers)
+        response = connection.getresponse()
+        response.read()
+        if response.status == 200:
+            count += 1
+    return count
+
+
+# Start gunicorn with the given number of workers and return it once it is serving - with response_cache=False, update_results responses are not cached
+def start_server(workers, threads, timeout=120, response_cache=True):
+    env = dict(os.environ, HYP_WORKERS=str(workers), HYP_THREADS=str(threads))
+    if not response_cache:
+        env["HYP_RESPONSE_CACHE_SIZE"] = "0"
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "hyp_controller:server", "--bind", f"127.0.0.1:{port}"],
+                              env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    start = time.time()
+    while True:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+            connection.request("GET", "/_dash-layout")
+            connection.getresponse().read()
+            return server
+        except OSError:
+            if time.time() - start > timeout:
+                server.terminate()
+                raise
+            time.sleep(0.1)
+
+
+# Requests per second for each number of workers, with enough concurrent clients to keep every worker thread busy
+def run_load_test(worker_counts, threads=1, duration=10, clients_per_thread=2, response_cache=True):
+    results = {}
+    for workers in worker_counts:
+        server = start_server(workers, threads, response_cache=response_cache)
+        try:
+            clients = workers * threads * clients_per_thread
+            with multiprocessing.Pool(clients) as pool:
+                deadline = time.time() + duration
+                counts = pool.map(run_client, [deadline] * clients)
+            results[workers] = sum(counts) / duration
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure submission throughput for different numbers of gunicorn workers")
+    parser.add_argument("--no-response-cache", action="store_true", help="disable the update_results response cache, to measure cold responses")
+    args = parser.parse_args()
+    cores = multiprocessing.cpu_count()
+    worker_counts = sorted({1, 2, max(cores // 2, 1), cores})
+    print(f"{'workers':>8}{'requests/s':>14}{'speedup':>10}    ({cores} cores)")
+    results = run_load_test(worker_counts, response_cache=not args.no_response_cache)
+    for workers, rps in results.items():
+        print(f"{workers:>8}{rps:>14.1f}{rps / results[worker_counts[0]]:>9.1f}x")
@@ -0,0 +1,243 @@
+import cProfile
+import hmac
+import io
+import math
+import os
+import pstats
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+import flask
+from dash import exceptions
+
+# Set HYP_METRICS=1 to time each server callback by phase and serve the timings at /metrics, in Prometheus text format. Timings are per process - under gunicorn, each worker keeps its own
+# Phases: "request" (the whole request), "callback" (the callback function), "serialization" (Dash's output validation and JSON encoding) and, within the callback, "stats" (t-test) and "figure" (graph traces)
+enabled = os.environ.get("HYP_METRICS") == "1"
+# Directory that /metrics/profile saves cProfile snapshots to, and the number of snapshots kept there - the oldest are deleted
+profile_dir = os.environ.get("HYP_PROFILE_DIR", tempfile.gettempdir())
+profile_keep = int(os.environ.get("HYP_PROFILE_KEEP", 5))
+# Token that /metrics/profile requires (as ?token=...), as profiling slows down every callback - without it, only requests from the same host can record a profile
+profile_token = os.environ.get("HYP_PROFILE_TOKEN")
+
+# Upper bounds, in seconds, of the phase timing histogram buckets
+buckets = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+# Timing histogram for each (callback, phase) - a count per bucket, then the total count and the sum of the timings
+phase_histograms = {}
+# Number of calls and of calls that raised an error (other than PreventUpdate) for each callback
+callback_calls = {}
+callback_errors = {}
+# Functions returning {labels: value} for extra gauges to report, keyed on (metric name, help text)
+gauges = {}
+metrics_lock = threading.Lock()
+
+# Phase timings of the callback running on the current thread
+current = threading.local()
+
+# Profiler shared by every callback while a profile is being recorded - callbacks are run one at a time while it is enabled
+profiler = None
+profiler_lock = threading.Lock()
+
+
+# Add a timing to the histogram for a callback phase
+def observe(callback, phase, seconds):
+    with metrics_lock:
+        histogram = phase_histograms.get((callback, phase))
+        if histogram is None:
+            histogram = phase_histograms[(callback, phase)] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += seconds
+
+
+# Context manager adding the wall time of a block to a phase of the callback running on the current thread
+class Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        phases = getattr(current, "phases", None)
+        if phases is not None:
+            phases[self.name] = phases.get(self.name, 0) + time.perf_counter() - self.start
+
+
+no_phase = nullcontext()
+
+
+# Time a block as a phase (e.g. "stats", "figure") of the callback running on the current thread - does nothing unless metrics are enabled
+def phase(name):
+    return Phase(name) if enabled else no_phase
+
+
+# Wrap a callback function to record its total time, the time in each phase within it, and the number of calls and errors
+def timed_callback(func):
+    name = func.__name__
+
+    def timed(*args, **kwargs):
+        current.phases = {}
+        start = time.perf_counter()
+        failed = False
+        try:
+            return func(*args, **kwargs)
+        except exceptions.PreventUpdate:
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            current.phases["callback"] = time.perf_counter() - start
+            with metrics_lock:
+                callback_calls[name] = callback_calls.get(name, 0) + 1
+                if failed:
+                    callback_errors[name] = callback_errors.get(name, 0) + 1
+
+    timed.__name__ = func.__name__
+    timed.__doc__ = func.__doc__
+    return timed
+
+
+# Wrap Dash's handler for a callback, which calls the callback function and then validates and serializes its outputs, to record the serialization time and the phases timed during the call
+def timed_handler(name, handler):
+    def timed(*args, **kwargs):
+        current.callback = name
+        current.phases = None
+        start = time.perf_counter()
+        try:
+            if profiler is None:
+                return handler(*args, **kwargs)
+            with profiler_lock:
+                if profiler is None:
+                    return handler(*args, **kwargs)
+                return profiler.runcall(handler, *args, **kwargs)
+        finally:
+            phases = current.phases
+            if phases is not None:
+                phases["serialization"] = time.perf_counter() - start - phases["callback"]
+                for phase_name, seconds in phases.items():
+                    observe(name, phase_name, seconds)
+                current.phases = None
+    return timed
+
+
+# Label string for a metric sample, e.g. {callback="update_results",phase="stats"}
+def format_labels(labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+# All metrics in Prometheus text exposition format
+def render_metrics():
+    lines = ["# HELP hyp_callback_phase_seconds Wall time of each phase of a server callback",
+             "# TYPE hyp_callback_phase_seconds histogram"]
+    with metrics_lock:
+        histograms = {key: list(histogram) for key, histogram in phase_histograms.items()}
+        calls = dict(callback_calls)
+        errors = dict(callback_errors)
+    for (callback, phase_name), histogram in sorted(histograms.items()):
+        labels = [("callback", callback), ("phase", phase_name)]
+        for bound, count in zip(buckets, histogram):
+            lines.append(f"hyp_callback_phase_seconds_bucket{format_labels(labels + [('le', bound)])} {count}")
+        lines.append(f"hyp_callback_phase_seconds_bucket{format_labels(labels + [('le', '+Inf')])} {histogram[-2]}")
+        lines.append(f"hyp_callback_phase_seconds_sum{format_labels(labels)} {histogram[-1]}")
+        lines.append(f"hyp_callback_phase_seconds_count{format_labels(labels)} {histogram[-2]}")
+    for metric, help_text, counts in [("hyp_callback_calls_total", "Number of calls to each server callback", calls),
+                                      ("hyp_callback_errors_total", "Number of server callback calls that raised an error", errors)]:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        for callback, count in sorted(counts.items()):
+            lines.append(f"{metric}{format_labels([('callback', callback)])} {count}")
+    for (metric, help_text), values in gauges.items():
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        for labels, value in values().items():
+            lines.append(f"{metric}{format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Longest profile /metrics/profile records, in seconds
+max_profile_seconds = 60
+
+
+# Profile every server callback for the given number of seconds (clamped to 0 to max_profile_seconds), save the profile for use with pstats/snakeviz and return the top functions by cumulative time
+def record_profile(seconds):
+    global profiler
+    seconds = min(max(seconds, 0), max_profile_seconds)
+    with profiler_lock:
+        if profiler is not None:
+            return None, "A profile is already being recorded\n"
+        profiler = cProfile.Profile()
+    # The profiler is always stopped, so that a failed recording does not leave every callback being profiled
+    try:
+        time.sleep(seconds)
+    finally:
+        with profiler_lock:
+            recorded, profiler = profiler, None
+    path = os.path.join(profile_dir, f"hyp-{os.getpid()}-{datetime.now():%Y%m%d-%H%M%S}.prof")
+    recorded.dump_stats(path)
+    prune_profiles()
+    text = io.StringIO()
+    try:
+        pstats.Stats(recorded, stream=text).sort_stats("cumulative").print_stats(40)
+    except TypeError:
+        # No calls were made while recording
+        text.write("No callbacks were called while recording\n")
+    return path, text.getvalue()
+
+
+# Delete all but the newest profile_keep snapshots in profile_dir
+def prune_profiles():
+    snapshots = sorted((entry for entry in os.scandir(profile_dir) if entry.name.startswith("hyp-") and entry.name.endswith(".prof")),
+                       key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in snapshots[profile_keep:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+# Whether the current request may record a profile - it gives profile_token, or, if no token is set, comes from the same host
+def profile_allowed():
+    if profile_token:
+        return hmac.compare_digest(flask.request.args.get("token", ""), profile_token)
+    return flask.request.remote_addr in ("127.0.0.1", "::1")
+
+
+# Instrument every server callback registered with the app and add the /metrics and /metrics/profile endpoints - call once all callbacks have been registered
+def instrument_app(app):
+    for entry in app.callback_map.values():
+        if "callback" in entry:
+            entry["callback"] = timed_handler(entry["callback"].__name__, entry["callback"])
+
+    # Time whole requests, including Flask's request handling and Dash's request parsing, as the "request" phase of the callback they call
+    @app.server.before_request
+    def start_request():
+        current.callback = None
+        current.request_start = time.perf_counter()
+
+    @app.server.after_request
+    def end_request(response):
+        if getattr(current, "callback", None) is not None:
+            observe(current.callback, "request", time.perf_counter() - current.request_start)
+        return response
+
+    @app.server.route("/metrics")
+    def metrics():
+        return flask.Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+    # /metrics/profile?seconds=N records a cProfile snapshot of the callbacks called in the next N seconds (default 10, at most 60) - see profile_allowed
+    @app.server.route("/metrics/profile")
+    def profile():
+        if not profile_allowed():
+            return flask.Response("Forbidden\n", status=403, mimetype="text/plain")
+        seconds = flask.request.args.get("seconds", 10, type=float)
+        if seconds is None or not math.isfinite(seconds):
+            return flask.Response("seconds must be a number\n", status=400, mimetype="text/plain")
+        path, text = record_profile(seconds)
+        if path is not None:
+            text = f"Profile saved to {path}\n\n{text}"
+        return flask.Response(text, mimetype="text/plain")
@@ -1,46 +1,772 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from functools import lru_cache, partial
+from pathlib import Path
 import numpy as np
-import pandas as pd
-import plotly.graph_objects as go
-import scipy.stats as stat
-
-# Generate dataframes from csv
-df_rda = pd.read_csv("data/rda.csv").reset_index(drop=True)
-df_antacid = pd.read_csv("data/antacid.csv").reset_index(drop=True)
-df_grades = pd.read_csv("data/grades.csv")
-
-# Convert dataframes to lists
-rda = df_rda["rda"].tolist()
-antacid = df_antacid["antacid"].tolist()
-grades = df_grades["grades"].tolist()
-
-# Generate confidence interval from dataset, alternative hypothesis and confidence level (alpha) entered by the user - used to update graph
-def update_statistics(dataset, alternative, alpha):
-    fig = go.Figure()
-    mean = np.mean(dataset)
-    sem = stat.sem(dataset)
-    nu = len(dataset) - 1
+import plotly.io as pio
+from hyp_cache import LRUCache
+import hyp_store
+
+# scipy.stats and plotly.graph_objects are slow to import/initialise (~0.5s each), so figures are built as plain dicts and scipy.stats is only imported when a test is first run - see t_test_p, t_interval and t_test_summaries
+
+# Directory containing the dataset CSV files
+data_dir = Path(__file__).resolve().parent / "data"
+
+# Loader for each registered dataset, keyed on the dropdown value - datasets are only loaded on first use
+dataset_loaders = {}
+# Values for each dataset that has been loaded
+dataset_values = {}
+# Version of the file each dataset is read from, as a hash of its path, size and modification time - names the dataset's arrays in the shared store (hyp_store), so that they are rebuilt when the file changes. Datasets registered without a file are kept in process memory
+dataset_versions = {}
+# Column names for each multi-column dataset - each column is also registered as a dataset named "dataset:column"
+dataset_columns = {}
+# File to stream for each dataset that is too big to load, as the (path, column, chunk_rows, dtype) arguments of iter_chunks - see register_streamed_dataset
+streamed_datasets = {}
+dataset_lock = threading.RLock()
+
+# Columns of multi-column datasets that label groups of rows rather than holding measurements
+group_columns = ["sample"]
+
+# Uploaded datasets are named "upload-" followed by a hash of the file, so that identical files uploaded by different users share one copy of the values and summary statistics
+upload_prefix = "upload-"
+# Name of an uploaded dataset - checked before the name (which comes from the browser) is used in file paths
+upload_pattern = re.compile(r"upload-[0-9a-f]{32}")
+# Largest CSV file that can be uploaded, in bytes
+max_upload_bytes = int(os.environ.get("HYP_MAX_UPLOAD_BYTES", 2 << 20))
+# Label, values and summary statistics of each uploaded dataset - the least recently used are evicted once their values total more than HYP_UPLOAD_CACHE_BYTES
+uploads = LRUCache(int(os.environ.get("HYP_UPLOAD_CACHE_BYTES", 64 << 20)), sizeof=lambda upload: upload["values"].nbytes)
+# Directory the label and values of each uploaded dataset are saved to, so that every gunicorn worker can load them, and evicted uploads can be reloaded - the oldest files are deleted once they total more than HYP_UPLOAD_DISK_BYTES
+upload_dir = Path(os.environ.get("HYP_UPLOAD_DIR", Path(tempfile.gettempdir()) / "hyp-uploads"))
+upload_disk_bytes = int(os.environ.get("HYP_UPLOAD_DISK_BYTES", 256 << 20))
+
+
+# Column names from the header row of a CSV file
+def read_csv_header(path):
+    with open(path, encoding="utf-8-sig") as f:
+        return f.readline().strip().split(",")
+
+
+# Read a CSV file with a header row as a contiguous float64 array - one-dimensional, without missing values, for a single column, otherwise one column per CSV column with missing values as NaN (see read_column_values)
+def read_csv_values(path):
+    columns = len(read_csv_header(path))
+    values = np.genfromtxt(path, delimiter=",", skip_header=1, dtype=np.float64, encoding="utf-8-sig", ndmin=1 if columns == 1 else 2)
+    if columns == 1:
+        values = values[~np.isnan(values)]
+    return np.ascontiguousarray(values)
+
+
+# Values of one column of a multi-column dataset, without missing values
+def read_column_values(dataset, column):
+    values = get_values(dataset)[:, dataset_columns[dataset].index(column)]
+    return np.ascontiguousarray(values[~np.isnan(values)])
+
+
+# Version of a file, as a hash of its path, size and modification time
+def file_version(path):
+    stat = os.stat(path)
+    return hashlib.sha256(f"{Path(path).resolve()}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+
+
+# Register a dataset by name - loader is called with no arguments the first time the dataset is used, and should return its values. If source (the file the values are read from) is given, the values and summary statistics are kept in the shared store
+def register_dataset(dataset, loader, source=None):
+    with dataset_lock:
+        dataset_loaders[dataset] = loader
+        dataset_values.pop(dataset, None)
+        if source is None:
+            dataset_versions.pop(dataset, None)
+        else:
+            dataset_versions[dataset] = file_version(source)
+
+
+# Name of an array (e.g. "values", "summary") of a dataset in the shared store - None for datasets that are not stored
+def store_name(dataset, kind):
+    version = dataset_versions.get(dataset)
+    if version is None:
+        return None
+    return f"{dataset.replace(':', '.')}-{kind}-{version}"
+
+
+# Array of a dataset from the shared store, computed with compute() and stored on first use - computed and kept in process memory for datasets that are not stored
+def stored_array(dataset, kind, compute):
+    name = store_name(dataset, kind)
+    if name is None:
+        return compute()
+    return hyp_store.get_array(name, compute)
+
+
+# Values for a dataset, loading them on first use
+def get_values(dataset):
+    if dataset.startswith(upload_prefix):
+        return get_upload(dataset)["values"]
+    values = dataset_values.get(dataset)
+    if values is None:
+        with dataset_lock:
+            values = dataset_values.get(dataset)
+            if values is None:
+                values = stored_array(dataset, "values", dataset_loaders[dataset])
+                # Read-only, as the values are shared between threads and worker processes
+                values.flags.writeable = False
+                dataset_values[dataset] = values
+    return values
+
+
+# Register every CSV file under data/, named after the file, and each column of multi-column files - only the columns of a multi-column file are kept in the shared store, as they are what is tested and drawn, and the whole table is only loaded (into process memory) to test the columns by group
+for path in sorted(data_dir.glob("*.csv")):
+    columns = read_csv_header(path)
+    if len(columns) == 1:
+        register_dataset(path.stem, partial(read_csv_values, path), path)
+        continue
+    register_dataset(path.stem, partial(read_csv_values, path))
+    dataset_columns[path.stem] = columns
+    for column in columns:
+        register_dataset(f"{path.stem}:{column}", partial(read_column_values, path.stem, column), path)
+
+# Measurement columns of a multi-column dataset (None for single-column datasets) - shown in the column picker
+def get_measurement_columns(dataset):
+    if dataset not in dataset_columns:
+        return None
+    return [column for column in dataset_columns[dataset] if column not in group_columns]
+
+
+# Dataset name used for the selected dataset and column - "dataset:column" for a column of a multi-column dataset
+def dataset_key(dataset, column):
+    columns = get_measurement_columns(dataset)
+    if columns is None:
+        return dataset
+    if column not in columns:
+        column = columns[0]
+    return f"{dataset}:{column}"
+
+
+# Summary statistics record for a dataset - sample size, mean, sample variance, standard error of the mean and degrees of freedom
+summary_dtype = np.dtype([("n", np.int64),
+                          ("mean", np.float64),
+                          ("var", np.float64),
+                          ("sem", np.float64),
+                          ("nu", np.int64)])
+
+
+# Compute the summary statistics for a dataset once, so that callbacks do not recompute them from the raw values on every request
+def summarise(dataset):
+    values = np.asarray(dataset, dtype=np.float64)
+    n = values.size
+    var = values.var(ddof=1)
+    return np.array((n, values.mean(), var, np.sqrt(var / n), n - 1), dtype=summary_dtype)[()]
+
+
+# Summary statistics for every column of a two-dimensional array (rows are observations) in one vectorized pass, ignoring missing (NaN) values
+def summarise_columns(values):
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    n = valid.sum(axis=0)
+    mean = np.where(valid, values, 0).sum(axis=0) / n
+    deviation = np.where(valid, values - mean, 0)
+    var = np.einsum("ij,ij->j", deviation, deviation) / (n - 1)
+    summaries = np.empty(values.shape[1], dtype=summary_dtype)
+    summaries["n"] = n
+    summaries["mean"] = mean
+    summaries["var"] = var
+    summaries["sem"] = np.sqrt(var / n)
+    summaries["nu"] = n - 1
+    return summaries
+
+
+# Summary statistics for every column of a two-dimensional array within each group of rows, ignoring missing (NaN) values - returns the group labels and an array of summaries with one row per group and one column per column of values
+def summarise_groups(values, groups):
+    values = np.asarray(values, dtype=np.float64)
+    labels, inverse = np.unique(groups, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    starts = np.searchsorted(inverse[order], np.arange(len(labels)))
+    sorted_values = values[order]
+    valid = ~np.isnan(sorted_values)
+    n = np.add.reduceat(valid, starts, axis=0)
+    mean = np.add.reduceat(np.where(valid, sorted_values, 0), starts, axis=0) / n
+    deviation = np.where(valid, sorted_values - np.repeat(mean, np.diff(np.append(starts, len(order))), axis=0), 0)
+    var = np.add.reduceat(deviation * deviation, starts, axis=0) / (n - 1)
+    summaries = np.empty(mean.shape, dtype=summary_dtype)
+    summaries["n"] = n
+    summaries["mean"] = mean
+    summaries["var"] = var
+    summaries["sem"] = np.sqrt(var / n)
+    summaries["nu"] = n - 1
+    return labels, summaries
+
+
+# Summary statistics for every column of a multi-column dataset, computed together on first use
+@lru_cache(maxsize=None)
+def get_column_summaries(dataset):
+    return summarise_columns(get_values(dataset))
+
+
+# Summary statistics for a dataset - those of uploaded datasets are stored with their values, so that both are evicted together
+def get_summary(dataset):
+    if dataset.startswith(upload_prefix):
+        return get_upload(dataset)["summary"]
+    return compute_summary(dataset)
+
+
+# Summary statistics for a registered dataset, computed once on first use and kept in the shared store with its values - a column of a multi-column dataset ("dataset:column") is taken from the summaries of all its columns, and a streamed dataset is summarised without loading its values
+@lru_cache(maxsize=None)
+def compute_summary(dataset):
+    if dataset in streamed_datasets:
+        return stream_summary(*streamed_datasets[dataset])[0]
+    return stored_array(dataset, "summary", partial(summarise_dataset, dataset))[()]
+
+
+# Summary statistics for a registered dataset, as a zero-dimensional array
+def summarise_dataset(dataset):
+    table, _, column = dataset.partition(":")
+    if column:
+        return np.asarray(get_column_summaries(table)[dataset_columns[table].index(column)])
+    return np.asarray(summarise(get_values(dataset)))
+
+
+# Store the values and summary statistics of every dataset registered with a source file in the shared store, and delete the stored arrays of older versions of the data files (and resampling results for other seeds or numbers of resamples) - run once by the launcher (see gunicorn.conf.py) before the workers start, so that they all map the same copy
+def build_store():
+    keep = set()
+    for dataset in list(dataset_versions):
+        get_values(dataset)
+        get_summary(dataset)
+        keep.update(store_name(dataset, kind) for kind in ["values", "summary"])
+        try:
+            total = resample_values(dataset)[1]
+        except ValueError:
+            continue
+        keep.update(store_name(dataset, f"{kind}-{resample_seed}-{total}") for kind in ["bootstrap", "sign-flip"])
+    hyp_store.prune(keep)
+
+
+# Sample size, mean and sum of squared deviations from the mean (n, mean, M2) of a chunk of values, ignoring missing (NaN) values
+def chunk_moments(values):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return 0, 0.0, 0.0
+    mean = values.mean()
+    deviation = values - mean
+    return values.size, mean, float(deviation @ deviation)
+
+
+# Combine the (n, mean, M2) moments of two chunks - Chan et al.'s pairwise update, which stays accurate when the mean is large relative to the spread (unlike accumulating sums of squares)
+def merge_moments(a, b):
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    if n_b == 0:
+        return a
+    if n_a == 0:
+        return b
+    delta = mean_b - mean_a
+    return n, mean_a + delta * n_b / n, m2_a + m2_b + delta * delta * n_a * n_b / n
+
+
+# Summary statistics record from (n, mean, M2) moments
+def moments_summary(moments):
+    n, mean, m2 = moments
+    var = m2 / (n - 1)
+    return np.array((n, mean, var, np.sqrt(var / n), n - 1), dtype=summary_dtype)[()]
+
+
+# Chunks of one column (by name, or the first column) of a CSV file with a header row, as float64 arrays, read chunk_rows rows at a time
+def iter_csv_chunks(path, column=None, chunk_rows=1 << 20):
+    import pandas as pd
+    reader = pd.read_csv(path, usecols=[column if column is not None else 0], dtype=np.float64,
+                         encoding="utf-8-sig", chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            yield chunk.iloc[:, 0].to_numpy()
+
+
+# Chunks of a binary file, memory-mapped rather than read into memory - a .npy file (one column, or the given column index of a two-dimensional array) or raw values of the given dtype
+def iter_binary_chunks(path, column=None, chunk_rows=1 << 20, dtype="<f8"):
+    if Path(path).suffix == ".npy":
+        values = np.load(path, mmap_mode="r")
+    else:
+        values = np.memmap(path, dtype=dtype, mode="r")
+    if values.ndim == 2:
+        values = values[:, column or 0]
+    for start in range(0, len(values), chunk_rows):
+        yield np.asarray(values[start:start + chunk_rows], dtype=np.float64)
+
+
+# Chunks of a CSV or binary file, as float64 arrays
+def iter_chunks(path, column=None, chunk_rows=1 << 20, dtype="<f8"):
+    if Path(path).suffix == ".csv":
+        return iter_csv_chunks(path, column, chunk_rows)
+    return iter_binary_chunks(path, column, chunk_rows, dtype)
+
+
+# Summary statistics for a CSV or binary file in constant memory, merging the moments of each chunk as it is read - returns the summary and the number of rows read
+def stream_summary(path, column=None, chunk_rows=1 << 20, dtype="<f8"):
+    moments = (0, 0.0, 0.0)
+    rows = 0
+    for chunk in iter_chunks(path, column, chunk_rows, dtype):
+        rows += len(chunk)
+        moments = merge_moments(moments, chunk_moments(chunk))
+    return moments_summary(moments), rows
+
+
+# Register a CSV or binary file too big to load as a dataset - it is summarised and binned by streaming it on first use, so t_test_1sided/t_test_2sided/conf_interval/get_bin_counts work on it as on any other dataset
+def register_streamed_dataset(dataset, path, column=None, chunk_rows=1 << 20, dtype="<f8"):
+    with dataset_lock:
+        streamed_datasets[dataset] = (path, column, chunk_rows, dtype)
+        clear_dataset_caches()
+
+
+# Functions called with no arguments when the cached results are cleared - e.g. to clear caches of responses built from them
+clear_hooks = []
+
+
+# Clear every result cached from the datasets' values (summaries, bin counts, p values and resamples), e.g. when a dataset is registered again with a different source
+def clear_dataset_caches():
+    for cached in [compute_summary, compute_bin_counts, t_test_p_cached, permutation_p, bootstrap_means, sign_flip_sums]:
+        cached.cache_clear()
+    for hook in clear_hooks:
+        hook()
+
+
+# Whether a CSV field is a number
+def is_number(field):
+    try:
+        float(field)
+        return True
+    except ValueError:
+        return False
+
+
+# Label and values of an uploaded CSV file - a header row naming the measurement, then one number per row. Raises ValueError, with a message to show the user, if the file is not in that format or a t-test cannot be run on it
+def parse_upload(contents):
+    try:
+        text = contents.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("The file is not a CSV text file")
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or "," in lines[0]:
+        raise ValueError("The file should have a single column, with a header row naming it")
+    label = lines[0].strip('"')
+    if is_number(label):
+        raise ValueError("The first row should be a header naming the column, not a value")
+    try:
+        values = np.array(lines[1:], dtype=np.float64)
+    except ValueError:
+        row, line = next((row, line) for row, line in enumerate(lines[1:], 2) if not is_number(line))
+        raise ValueError(f"Row {row} is not a number: {line[:20]}")
+    if values.size < 2:
+        raise ValueError("The file needs at least two values")
+    if not np.all(np.isfinite(values)):
+        raise ValueError("The values should all be finite numbers")
+    if values.min() == values.max():
+        raise ValueError("The values are all the same - a t-test needs some variation")
+    with np.errstate(over="ignore", invalid="ignore"):
+        variance = values.var()
+    if not np.isfinite(variance):
+        raise ValueError("The values are too large to calculate their variance")
+    # The histogram bins are rounded to 10 decimal places, and differences of less than a billionth of the values are lost to rounding error
+    if values.max() - values.min() < max(1e-8, 1e-9 * np.abs(values).max()):
+        raise ValueError("The values are too close together - a t-test needs more variation")
+    return label, values
+
+
+# Add an uploaded CSV file as a dataset and return its name - a file that is already stored (uploaded by anyone) is not parsed or summarised again. Set check_size to False for trusted local files, which are not limited to max_upload_bytes
+def add_upload(contents, check_size=True):
+    if check_size and len(contents) > max_upload_bytes:
+        raise ValueError(f"The file is larger than the {max_upload_bytes // 1024} KB limit")
+    dataset = upload_prefix + hashlib.sha256(contents).hexdigest()[:32]
+    if uploads.get(dataset) is None and load_upload(dataset) is None:
+        label, values = parse_upload(contents)
+        save_upload(dataset, label, values)
+        # Keep the saved copy, which is shared with the other workers, rather than this one
+        if load_upload(dataset) is None:
+            store_upload(dataset, label, values)
+    return dataset
+
+
+# Keep the label, values and summary statistics of an uploaded dataset in memory
+def store_upload(dataset, label, values):
+    # Read-only, as the values are shared between users
+    values.flags.writeable = False
+    upload = {"label": label, "values": values, "summary": summarise(values)}
+    uploads.put(dataset, upload)
+    return upload
+
+
+# Save the label and values of an uploaded dataset to upload_dir, then delete the oldest saved uploads beyond upload_disk_bytes. The values are saved as a .npy file that every worker memory-maps (see hyp_store), after the label, so that other workers never load an upload without its label
+def save_upload(dataset, label, values):
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    path = upload_dir / f"{dataset}.npy"
+    (upload_dir / f"{dataset}.txt").write_text(label, encoding="utf-8")
+    hyp_store.save_array(path, values)
+    saved = sorted(upload_dir.glob(f"{upload_prefix}*.npy"), key=lambda saved_path: saved_path.stat().st_mtime, reverse=True)
+    total = 0
+    for saved_path in saved:
+        total += saved_path.stat().st_size
+        if total > upload_disk_bytes and saved_path != path:
+            saved_path.unlink(missing_ok=True)
+            saved_path.with_suffix(".txt").unlink(missing_ok=True)
+
+
+# Load an uploaded dataset saved by save_upload (e.g. by another worker, or before it was evicted from memory) - None if it is not saved, or the name is not that of an uploaded dataset
+def load_upload(dataset):
+    if not upload_pattern.fullmatch(dataset):
+        return None
+    try:
+        label = (upload_dir / f"{dataset}.txt").read_text(encoding="utf-8")
+    except OSError:
+        return None
+    values = hyp_store.load_array(upload_dir / f"{dataset}.npy")
+    if values is None:
+        return None
+    return store_upload(dataset, label, values)
+
+
+# Label, values and summary statistics of an uploaded dataset - raises KeyError if it is neither in memory nor saved, in which case the file needs uploading again
+def get_upload(dataset):
+    upload = uploads.get(dataset)
+    if upload is None:
+        upload = load_upload(dataset)
+        if upload is None:
+            raise KeyError(dataset)
+    return upload
+
+
+# Number of histogram bins plotly.js draws for xbins start/end/size - bins are added while they start more than a millionth of a bin before end
+def bin_total(start, end, size):
+    return max(int(np.ceil((end - start) / size - 1e-6)), 0)
+
+
+# Count of values in each histogram bin, binned as plotly.js bins a histogram trace with xbins start/end/size - each bin includes its left edge but not its right edge (with a tolerance of 1e-9 bins), and missing values or values outside the bins are not counted
+def bin_counts(values, start, end, size):
+    total = bin_total(start, end, size)
+    index = np.floor((np.asarray(values, dtype=np.float64) - start) / size + 1e-9)
+    index = index[(index >= 0) & (index < total)]
+    return np.bincount(index.astype(np.intp), minlength=total)
+
+
+# Histogram bin counts for a dataset, so that the graph shows one bar per bin rather than sending every value to the browser - not cached for uploaded datasets, whose base figure is only built once per upload
+def get_bin_counts(dataset, start, end, size):
+    if dataset.startswith(upload_prefix):
+        return bin_counts(get_values(dataset), start, end, size)
+    return compute_bin_counts(dataset, start, end, size)
+
+
+# Histogram bin counts for a registered dataset, computed once - streamed in chunks for datasets too big to load
+@lru_cache(maxsize=None)
+def compute_bin_counts(dataset, start, end, size):
+    if dataset in streamed_datasets:
+        counts = np.zeros(bin_total(start, end, size), dtype=np.int64)
+        for chunk in iter_chunks(*streamed_datasets[dataset]):
+            counts += bin_counts(chunk, start, end, size)
+        return counts
+    return bin_counts(get_values(dataset), start, end, size)
+
+
+# p value for a one-sample t-test computed from the cached summary statistics - equivalent to stat.ttest_1samp
+def t_test_p(summary, hyp_mean, alternative):
+    import scipy.stats as stat
+    t = (summary["mean"] - hyp_mean) / summary["sem"]
+    if alternative == "less":
+        return stat.t.cdf(t, summary["nu"])
+    elif alternative == "greater":
+        return stat.t.sf(t, summary["nu"])
+    return 2 * stat.t.sf(np.abs(t), summary["nu"])
+
+
+# Result record for a vectorized one-sample t-test - t statistic, p value and confidence interval
+t_test_dtype = np.dtype([("t", np.float64),
+                         ("p", np.float64),
+                         ("lower", np.float64),
+                         ("upper", np.float64)])
+
+
+# One-sample t-test and confidence interval for an array of summary statistics (e.g. from summarise_columns or summarise_groups) in one vectorized pass - hyp_mean may be a scalar or an array that broadcasts against the summaries. For a one-sided test the unbounded end of the confidence interval is -inf/inf
+def t_test_summaries(summaries, hyp_mean, alternative, alpha):
+    import scipy.stats as stat
+    results = np.empty(np.broadcast_shapes(np.shape(summaries), np.shape(hyp_mean)), dtype=t_test_dtype)
+    results["t"] = (summaries["mean"] - hyp_mean) / summaries["sem"]
+    results["p"] = t_test_p(summaries, hyp_mean, alternative)
+    confidence = alpha if alternative in ["less", "greater"] else (2*alpha)-1
+    margin = stat.t.ppf((1 + confidence) / 2, summaries["nu"]) * summaries["sem"]
+    results["lower"] = -np.inf if alternative == "less" else summaries["mean"] - margin
+    results["upper"] = np.inf if alternative == "greater" else summaries["mean"] + margin
+    return results
+
+
+# One-sample t-test for every column of a multi-column dataset, or for every column within each group of rows labelled by group_column - returns the column names, the group labels (None if not grouped) and the results array
+def t_test_columns(dataset, hyp_mean, alternative, alpha, group_column=None):
+    columns = [column for column in dataset_columns[dataset] if column not in group_columns]
+    indices = [dataset_columns[dataset].index(column) for column in columns]
+    if group_column is None:
+        # From the stored summaries of the columns, so that the whole table is not loaded
+        summaries = np.array([get_summary(f"{dataset}:{column}") for column in columns], dtype=summary_dtype)
+        return columns, None, t_test_summaries(summaries, hyp_mean, alternative, alpha)
+    values = get_values(dataset)
+    groups = values[:, dataset_columns[dataset].index(group_column)]
+    labels, summaries = summarise_groups(values[:, indices], groups)
+    return columns, labels, t_test_summaries(summaries, hyp_mean, alternative, alpha)
+
+
+# Result record for a sweep of hypothesised means - hypothesised mean, t statistic, p value, and power of the test of the sweep's null mean if the population mean were the hypothesised mean
+sweep_dtype = np.dtype([("hyp_mean", np.float64),
+                        ("t", np.float64),
+                        ("p", np.float64),
+                        ("power", np.float64)])
+
+
+# Largest spacing, in units of the t statistic, between the points at which power is computed exactly for a sweep - it is interpolated between them (to within 1e-8) when the sweep has more points than that
+power_spacing = 0.05
+
+
+# Probability of rejecting the null hypothesis (p < 1 - alpha) for each noncentrality of the t statistic - the power if the population mean were sem * noncentrality away from the hypothesised mean
+def t_test_power(noncentrality, nu, alternative, alpha):
+    import scipy.stats as stat
+    from scipy.special import ndtr
+    # SciPy's noncentral t warns of invalid values far out in its tails, where it still gives 0 or 1
+    with np.errstate(invalid="ignore"):
+        if alternative == "less":
+            return stat.nct.cdf(stat.t.ppf(1 - alpha, nu), nu, noncentrality)
+        if alternative == "greater":
+            return stat.nct.sf(stat.t.ppf(alpha, nu), nu, noncentrality)
+        # Power is symmetric in the noncentrality - the probability of the t statistic falling beyond the critical value on the same side, plus that of it falling beyond the other. The latter is at most ndtr(-|noncentrality|), so it is only computed where that is not negligible
+        crit = stat.t.ppf((1 + alpha) / 2, nu)
+        noncentrality = np.abs(noncentrality)
+        power = stat.nct.sf(crit, nu, noncentrality)
+        near = ndtr(-noncentrality) > 1e-17
+        power[near] += stat.nct.cdf(-crit, nu, noncentrality[near])
+        return power
+
+
+# One-sample t-test (or sign-flip permutation test, for method "resample") for every hypothesised mean in an array in one vectorized pass, so that the p value can be plotted against the hypothesised mean from a single request, with the power of the test of null_mean if the population mean were each of those means - so the noncentrality of the t statistic is (mean - null_mean) / sem. Power is computed exactly at points power_spacing apart and interpolated with a cubic spline for finer sweeps, as the noncentral t distribution is slow to evaluate. The power is always that of the t-test, as the permutation test's has no closed form
+def t_test_sweep(dataset, hyp_means, alternative, alpha, null_mean, method="t"):
+    summary = get_summary(dataset)
+    nu = int(summary["nu"])
+    results = np.empty(np.shape(hyp_means), dtype=sweep_dtype)
+    results["hyp_mean"] = hyp_means
+    results["t"] = (summary["mean"] - results["hyp_mean"]) / summary["sem"]
+    if method == "resample":
+        results["p"] = permutation_sweep_p(dataset, results["hyp_mean"].ravel(), alternative).reshape(results.shape)
+    else:
+        results["p"] = t_test_p(summary, results["hyp_mean"], alternative)
+    if results.size == 0:
+        return results
+    noncentrality = (results["hyp_mean"] - null_mean) / summary["sem"]
+    knots = int(np.ceil((noncentrality.max() - noncentrality.min()) / power_spacing)) + 1
+    if knots >= results.size:
+        results["power"] = t_test_power(noncentrality, nu, alternative, alpha)
+    else:
+        from scipy.interpolate import CubicSpline
+        grid = np.linspace(noncentrality.min(), noncentrality.max(), knots)
+        results["power"] = CubicSpline(grid, t_test_power(grid, nu, alternative, alpha))(noncentrality)
+    return results
+
+
+# Standard (loc=0, scale=1) t interval for the given degrees of freedom and confidence level, memoized as the UI only produces a small set of confidence levels
+@lru_cache(maxsize=256)
+def t_interval(nu, confidence):
+    import scipy.stats as stat
+    q = (1 + confidence) / 2
+    crit = stat.t.ppf(q, nu)
+    # One Newton step on the t CDF - stat.t.ppf can be out by ~1e-9 for some degrees of freedom
+    crit -= (stat.t.cdf(crit, nu) - q) / stat.t.pdf(crit, nu)
+    return -crit, crit
+
+
+# p value for the given dataset, hypothesised mean and alternative, memoized as the hypothesised mean slider only takes a small set of values
+@lru_cache(maxsize=4096)
+def t_test_p_cached(dataset, hyp_mean, alternative):
+    return t_test_p(get_summary(dataset), hyp_mean, alternative)
+
+
+# Confidence interval for the population mean, scaled from the memoized standard t interval
+def conf_interval(dataset, confidence):
+    summary = get_summary(dataset)
+    lower, upper = t_interval(int(summary["nu"]), confidence)
+    return lower * summary["sem"] + summary["mean"], upper * summary["sem"] + summary["mean"]
+
+
+# Precompute the p values and confidence intervals for every hypothesised mean and confidence level the UI can produce for a dataset
+def warm_t_cache(dataset, hyp_means, alphas):
+    for alpha in alphas:
+        conf_interval(dataset, alpha)
+        conf_interval(dataset, (2*alpha)-1)
+    for hyp_mean in hyp_means:
+        for alternative in ["less", "greater", "two-sided"]:
+            t_test_p_cached(dataset, hyp_mean, alternative)
+
+
+# Number of resamples for the bootstrap confidence interval and sign-flip permutation test, the seed of their random number generators, and the number of processes to spread the resampling over (worth it for millions of resamples)
+resamples = int(os.environ.get("HYP_RESAMPLES", 100000))
+resample_seed = int(os.environ.get("HYP_RESAMPLE_SEED", 0))
+resample_processes = int(os.environ.get("HYP_RESAMPLE_PROCESSES", 1))
+# Number of values (resamples x sample size) drawn at a time, bounding the memory used
+resample_chunk_values = 1 << 22
+# Most values (resamples x sample size) drawn by each resampling of a dataset, bounding the time it takes - fewer than HYP_RESAMPLES resamples are drawn for larger samples, down to min_resamples, beyond which a sample can only be tested with the t-test. Set HYP_RESAMPLE_MAX_VALUES to change it
+resample_max_values = int(os.environ.get("HYP_RESAMPLE_MAX_VALUES", 5_000_000))
+min_resamples = 1000
+
+
+# Means of rows resamples of values drawn with replacement, as one (rows x n) array operation
+def bootstrap_chunk(values, rows, seed):
+    rng = np.random.default_rng(seed)
+    return values[rng.integers(0, values.size, (rows, values.size), dtype=np.int32)].mean(axis=1)
+
+
+# Sums of rows random sign flips of values, and the sums of the signs, as one (rows x n) array operation - the signs are the bits of random bytes, as 2 * bit - 1
+def sign_flip_chunk(values, rows, seed):
+    rng = np.random.default_rng(seed)
+    bits = np.unpackbits(rng.integers(0, 256, (rows, (values.size + 7) // 8), dtype=np.uint8), axis=1, count=values.size)
+    return np.stack([2 * (bits @ values) - values.sum(), 2.0 * bits.sum(axis=1, dtype=np.int64) - values.size], axis=1)
+
+
+# Progress reporting for the resampling running on the current thread - background callbacks set progress.report to a function called with the resampling function and the fraction of resamples drawn after each chunk
+progress = threading.local()
+
+
+# Run a resampling function over the values in chunks, each with its own seeded generator, and concatenate the results - the chunks are the same however many processes they are spread over, so results are reproducible
+def resample(func, values, total=None, processes=None):
+    total = total or resamples
+    processes = processes or resample_processes
+    rows = max(resample_chunk_values // values.size, 1)
+    chunks = [(values, min(rows, total - start), [resample_seed, i]) for i, start in enumerate(range(0, total, rows))]
+    report = getattr(progress, "report", None)
+    if processes > 1 and len(chunks) > 1:
+        import multiprocessing
+        with multiprocessing.Pool(min(processes, len(chunks))) as pool:
+            if report is None:
+                return np.concatenate(pool.starmap(func, chunks))
+            pending = [pool.apply_async(func, chunk) for chunk in chunks]
+            results = []
+            for result in pending:
+                results.append(result.get())
+                report(func, len(results) / len(chunks))
+            return np.concatenate(results)
+    results = []
+    for chunk in chunks:
+        results.append(func(*chunk))
+        if report is not None:
+            report(func, len(results) / len(chunks))
+    return np.concatenate(results)
+
+
+# Largest sample that can be resampled - at least min_resamples resamples within resample_max_values
+def max_resample_size():
+    return resample_max_values // min_resamples
+
+
+# Values of a dataset to resample and the number of resamples to draw from them - raises ValueError, with a message to show the user, for streamed datasets (which are too big to load) and samples larger than max_resample_size, which can only be tested with the t-test
+def resample_values(dataset):
+    if dataset in streamed_datasets:
+        raise ValueError(f"{dataset} is streamed from a file too big to load, so it can only be tested with the t-test")
+    values = get_values(dataset)
+    if values.size > max_resample_size():
+        raise ValueError(f"Resampling is limited to samples of {max_resample_size():,} values - use the t-test for this sample of {values.size:,} values")
+    return values, min(resamples, resample_max_values // values.size)
+
+
+# Array of resampling results (e.g. "bootstrap") for a dataset, the seed and the number of resamples, computed with compute() on first use and kept in the shared store - so that other processes, such as each background job, map it rather than resampling again. An uploaded dataset's are saved with its values in upload_dir, where they count towards upload_disk_bytes
+def resample_array(dataset, kind, total, compute):
+    name = f"{kind}-{resample_seed}-{total}"
+    if not dataset.startswith(upload_prefix):
+        return stored_array(dataset, name, compute)
+    path = upload_dir / f"{dataset}-{name}.npy"
+    array = hyp_store.load_array(path)
+    if array is None:
+        array = compute()
+        try:
+            hyp_store.save_array(path, array)
+        except OSError:
+            pass
+    return array
+
+
+# Sorted bootstrap distribution of the mean of a dataset, computed once - bounded, as uploaded datasets are
+@lru_cache(maxsize=32)
+def bootstrap_means(dataset):
+    values, total = resample_values(dataset)
+    return resample_array(dataset, "bootstrap", total, lambda: np.sort(resample(bootstrap_chunk, values, total)))
+
+
+# Sign-flip sums (flipped, signs) of a dataset, computed once - the sum of the flipped deviations from any hypothesised mean is flipped - hyp_mean * signs, so one set of sign flips serves every hypothesised mean
+@lru_cache(maxsize=32)
+def sign_flip_sums(dataset):
+    values, total = resample_values(dataset)
+    sums = resample_array(dataset, "sign-flip", total, lambda: np.ascontiguousarray(resample(sign_flip_chunk, values, total).T))
+    return sums[0], sums[1]
+
+
+# Percentile bootstrap confidence interval for the population mean - equivalent to conf_interval, without assuming the sample mean is t distributed
+def bootstrap_interval(dataset, confidence):
+    means = bootstrap_means(dataset)
+    return tuple(np.quantile(means, [(1 - confidence) / 2, (1 + confidence) / 2]))
+
+
+# Number of sign flips at least as extreme as the observed sum of the deviations from each of an array of hypothesised means - the flipped sums are computed for a block of hypothesised means at a time, bounding the memory used
+def permutation_counts(dataset, hyp_means, alternative):
+    flipped, signs = sign_flip_sums(dataset)
+    values = get_values(dataset)
+    hyp_means = np.asarray(hyp_means, dtype=np.float64)
+    counts = np.empty(hyp_means.size, dtype=np.int64)
+    rows = max(resample_chunk_values // max(flipped.size, values.size), 1)
+    for start in range(0, hyp_means.size, rows):
+        block = hyp_means[start:start + rows, None]
+        observed = values.sum() - values.size * block
+        sums = flipped - block * signs
+        # Sign flips that give the observed sum can differ from it by rounding error
+        tolerance = 1e-9 * np.abs(values - block).sum(axis=1, keepdims=True)
+        if alternative == "less":
+            counts[start:start + rows] = np.count_nonzero(sums <= observed + tolerance, axis=1)
+        elif alternative == "greater":
+            counts[start:start + rows] = np.count_nonzero(sums >= observed - tolerance, axis=1)
+        else:
+            counts[start:start + rows] = np.count_nonzero(np.abs(sums) >= np.abs(observed) - tolerance, axis=1)
+    return counts
+
+
+# p value for a one-sample sign-flip permutation test - under the null hypothesis the deviations from the hypothesised mean are symmetric about 0, so each sign flip is as likely as the observed signs. Counts the flips at least as extreme as the observed sum of the deviations, plus one for the observed signs themselves, so the p value is never 0
+@lru_cache(maxsize=4096)
+def permutation_p(dataset, hyp_mean, alternative):
+    return float(permutation_sweep_p(dataset, [hyp_mean], alternative)[0])
+
+
+# Sign-flip permutation test p values for an array of hypothesised means, all from the one set of sign flips
+def permutation_sweep_p(dataset, hyp_means, alternative):
+    return (permutation_counts(dataset, hyp_means, alternative) + 1) / (sign_flip_sums(dataset)[0].size + 1)
+
+
+# p value and confidence interval functions for each test method selectable in the UI - the t-test, or a sign-flip permutation test with a bootstrap confidence interval
+methods = {"t": (t_test_p_cached, conf_interval),
+           "resample": (permutation_p, bootstrap_interval)}
+
+
+# Hit/miss counters for the t interval and p value caches - used for monitoring
+def t_cache_stats():
+    stats = {}
+    for name, cached in [("t_interval", t_interval), ("p_value", t_test_p_cached)]:
+        info = cached.cache_info()
+        stats[name] = {"hits": info.hits,
+                       "misses": info.misses,
+                       "size": info.currsize,
+                       "maxsize": info.maxsize}
+    return stats
+
+
+# Generate confidence interval from dataset, alternative hypothesis, confidence level (alpha) and test method entered by the user - used to update graph
+def update_statistics(dataset, alternative, alpha, method="t"):
+    fig = {"data": [], "layout": {}}
+    interval = methods[method][1]
     if alternative == "<" or alternative == ">":
-        conf_int = stat.t.interval(df=nu,
-                                   confidence=alpha,
-                                   loc=mean,
-                                   scale=sem)
+        conf_int = interval(dataset, alpha)
     else:
-        conf_int = stat.t.interval(df=nu,
-                                   confidence=(2*alpha)-1,
-                                   loc=mean,
-                                   scale=sem)
+        conf_int = interval(dataset, (2*alpha)-1)
     return fig, conf_int
 
-# 1-sided t-test - returns p value and confidence interval - used for Results section
-def t_test_1sided(dataset, hyp_mean, alternative, alpha):
-    mean = np.mean(dataset)
-    sem = stat.sem(dataset)
-    nu = len(dataset) - 1
-    _, p = stat.ttest_1samp(a=dataset, popmean=hyp_mean, alternative=alternative)
-    conf_int = stat.t.interval(df=nu,
-                               confidence=alpha,
-                               loc=mean,
-                               scale=sem)
+# 1-sided t-test (or permutation test, for method "resample") - returns p value and confidence interval - used for Results section
+def t_test_1sided(dataset, hyp_mean, alternative, alpha, method="t"):
+    p_value, interval = methods[method]
+    p = p_value(dataset, hyp_mean, alternative)
+    conf_int = interval(dataset, alpha)
     if alternative == "less":
         conf_text = f"Upper bound for population mean: "
         conf_val = f"{conf_int[1]:.3f}"
@@ -50,33 +776,63 @@ def t_test_1sided(dataset, hyp_mean, alternative, alpha):
     return p, conf_text, conf_val
 
 
-# 2-sided t-test - returns p value and confidence interval - used for Results section
-def t_test_2sided(dataset, hyp_mean, alpha):
-    mean = np.mean(dataset)
-    sem = stat.sem(dataset)
-    nu = len(dataset) - 1
-    _, p = stat.ttest_1samp(a=dataset, popmean=hyp_mean, alternative="two-sided")
-    conf_int = stat.t.interval(df=nu,
-                               confidence=(2*alpha)-1,
-                               loc=mean,
-                               scale=sem)
+# 2-sided t-test (or permutation test, for method "resample") - returns p value and confidence interval - used for Results section
+def t_test_2sided(dataset, hyp_mean, alpha, method="t"):
+    p_value, interval = methods[method]
+    p = p_value(dataset, hyp_mean, "two-sided")
+    conf_int = interval(dataset, (2*alpha)-1)
     conf_text = "Confidence interval for population mean: "
     conf_val = f"({conf_int[0]:.3f}, {conf_int[1]:.3f})"
     return p, conf_text, conf_val
 
-# Create blank figure (UX)
-def create_blank_fig():
-    blank_fig = go.Figure(
-        go.Histogram(x=antacid,
-                     xbins={"start": 3, "end": 17, "size": 2},
-                     name="Time to take<br>effect (mins)",
-                     hovertemplate="Time (mins): %{x}" + "<br>Count: %{y}<extra></extra>",
-                     marker_line_color="rgba(158,171,5,1)",
-                     marker_color="rgba(158,171,5,0.5)",
-                     marker_line_width=1,
-                     showlegend=True),
-            layout={"margin": dict(t=20, b=10, l=20, r=20),
-                    "height": 400,
-                    "font_size": 14})
-    blank_fig.update_layout(dragmode=False)
+# SciPy name of each alternative hypothesis
+alternatives = {"<": "less",
+                ">": "greater",
+                "!=": "two-sided"}
+
+
+# Whether the null hypothesis is rejected ("reject" or "accept") for a p value at a confidence level, and the reason shown to the user
+def hypothesis_decision(p, alpha):
+    if p < 1 - alpha:
+        return "reject", f" - {p:.3f} is less than {(1-alpha):.2f}, so we reject the null hypothesis at the {alpha:.0%} confidence level"
+    return "accept", f" - {p:.3f} is greater than {(1-alpha):.2f}, so we accept the null hypothesis at the {alpha:.0%} confidence level"
+
+
+# Bin edge formatted for hover text, without floating point error or a trailing ".0"
+def format_edge(x):
+    x = round(float(x), 10)
+    return f"{int(x)}" if x == int(x) else f"{x}"
+
+
+# Bar trace properties (x, y, width and customdata) drawing the histogram of a dataset from its bin counts - one bar per bin, centred on the bin, with the bin range as customdata for the hover text. As plotly.js does, the range ends at the largest value that can fall in the bin when the values and bin size are whole numbers (e.g. "3 - 4" for the bin from 3 to 5)
+def histogram_bars(dataset, start, end, size):
+    counts = get_bin_counts(dataset, start, end, size)
+    whole = size == int(size) and dataset not in streamed_datasets and bool(np.all(np.nan_to_num(get_values(dataset)) % 1 == 0))
+    lefts = [start + i * size for i in range(len(counts))]
+    return {"x": [round(left + size / 2, 10) for left in lefts],
+            "y": counts,
+            "width": size,
+            "customdata": [f"{format_edge(left)} - {format_edge(left + size - 1 if whole else left + size)}" for left in lefts]}
+
+
+# Default plotly.py figure template, as added to the layout of a go.Figure - serialized once
+@lru_cache(maxsize=None)
+def get_template():
+    return pio.templates[pio.templates.default].to_plotly_json()
+
+
+# Create blank figure (UX) - the histogram of a dataset, with its histogram settings (see hyp_config), shown before the first submission
+def create_blank_fig(dataset, settings):
+    blank_fig = {"data": [{"type": "bar",
+                           **histogram_bars(dataset, settings.start, settings.end, settings.size),
+                           "name": settings.name,
+                           "hovertemplate": settings.hovertemplate,
+                           "marker": {"color": "rgba(158,171,5,0.5)",
+                                      "line": {"color": "rgba(158,171,5,1)", "width": 1}},
+                           "showlegend": True}],
+                 "layout": {"template": get_template(),
+                            "margin": dict(t=20, b=10, l=20, r=20),
+                            "height": 400,
+                            "font": {"size": 14},
+                            "dragmode": False}}
     return blank_fig
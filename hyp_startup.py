@@ -0,0 +1,99 @@
+import os
+import posixpath
+import re
+import subprocess
+import sys
+import time
+import urllib.request
+
+# Cold start budget in seconds - from launching the server to the first byte of the page and of the layout
+budget = 3.0
+port = 8071
+# Chunks that dash_core_components loads on demand for the components on the page - the graph, its plotly.js bundle and the sliders
+lazy_chunks = ["dash/dcc/async-graph.js", "dash/dcc/async-plotlyjs.js", "dash/dcc/async-slider.js"]
+# Link speed used to estimate the first-load transfer time, in bits per second
+link_speed = 10e6
+
+
+# Import hyp_controller in a fresh interpreter with -X importtime and return the slowest modules it imports directly as (seconds, module) pairs
+def profile_imports(top=10):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import hyp_controller"],
+                            capture_output=True, text=True, env=dict(os.environ, HYP_WARM_CACHE="off"))
+    imports = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line)
+        if match and not match.group(2) and match.group(3) != "hyp_controller":
+            imports = []
+        elif match and len(match.group(2)) == 2:
+            imports.append((int(match.group(1)) / 1e6, match.group(3)))
+    return sorted(imports, reverse=True)[:top]
+
+
+# Start the server in a subprocess and return the time in seconds to the first byte of each path
+def time_to_first_byte(paths=("/", "/_dash-layout"), timeout=60):
+    script = f"from hyp_controller import app; app.run(port={port}, debug=False)"
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    timings = {}
+    try:
+        for path in paths:
+            while True:
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}") as response:
+                        response.read(1)
+                    break
+                except OSError:
+                    if time.perf_counter() - start > timeout:
+                        raise
+                    time.sleep(0.02)
+            timings[path] = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    return timings
+
+
+# Fetch the page and everything it loads on first visit (scripts, stylesheets, fonts, lazy-loaded chunks, layout and callback dependencies) with the Flask test client, as a browser accepting Brotli and gzip would. Returns the bytes transferred and server time for each URL, and the URLs of external resources, which are not fetched
+def page_weight():
+    os.environ.setdefault("HYP_WARM_CACHE", "off")
+    from hyp_controller import app
+    client = app.server.test_client()
+    page = client.get("/").get_data(as_text=True)
+    urls = re.findall(r'<script src="([^"]+)"', page) + re.findall(r'<link rel="(?:stylesheet|icon)"[^>]* href="([^"]+)"', page)
+    urls += [f"/_dash-component-suites/{chunk}" for chunk in lazy_chunks]
+    urls += ["/_dash-layout", "/_dash-dependencies"]
+    # Fonts referenced by local stylesheets
+    for url in list(urls):
+        if url.startswith("/") and ".css" in url:
+            css = client.get(url).get_data(as_text=True)
+            for font in re.findall(r'url\("?([^")]+)"?\)', css):
+                if not font.startswith(("data:", "http")):
+                    urls.append(posixpath.join(posixpath.dirname(url.split("?")[0]), font))
+    weights = {}
+    external = []
+    for url in ["/"] + urls:
+        if url.startswith("http"):
+            external.append(url)
+            continue
+        start = time.perf_counter()
+        response = client.get(url, headers={"Accept-Encoding": "br, gzip"})
+        weights[url] = (len(response.get_data()), time.perf_counter() - start, response.headers.get("Content-Encoding", "identity"))
+    return weights, external
+
+
+if __name__ == "__main__":
+    print(f"{'module':<40}{'cumulative (s)':>16}")
+    for seconds, module in profile_imports():
+        print(f"{module:<40}{seconds:>16.3f}")
+    print()
+    for path, seconds in time_to_first_byte().items():
+        print(f"first byte of {path:<20}{seconds:>8.3f} s ({'within' if seconds <= budget else 'over'} the {budget:.1f} s budget)")
+    print()
+    weights, external = page_weight()
+    for url, (size, seconds, encoding) in weights.items():
+        print(f"{url.split('?')[0][-60:]:<62}{size:>10}{encoding:>10}{seconds * 1e3:>9.1f} ms")
+    total = sum(size for size, _, _ in weights.values())
+    print(f"{len(weights)} requests, {total} bytes, {sum(seconds for _, seconds, _ in weights.values()) * 1e3:.0f} ms server time, "
+          f"~{total * 8 / link_speed:.2f} s to transfer at {link_speed / 1e6:.0f} Mbit/s")
+    for url in external:
+        print(f"not measured (external): {url}")
@@ -0,0 +1,78 @@
+import os
+import tempfile
+from pathlib import Path
+import numpy as np
+
+# Read-only store of dataset arrays as .npy files that every process memory-maps rather than reading into its own memory, so that gunicorn workers (and background jobs) share one copy of each dataset in the page cache. Kept in /dev/shm where it exists, so that the files are backed by shared memory rather than disk
+# Set HYP_SHARED_STORE=0 to keep arrays in each process's own memory instead, and HYP_STORE_DIR to change the directory
+enabled = os.environ.get("HYP_SHARED_STORE", "1") == "1"
+store_dir = Path(os.environ.get("HYP_STORE_DIR", Path("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()) / "hyp-store"))
+# Set to False the first time the store cannot be written to (e.g. a read-only or full file system), after which arrays are kept in process memory
+available = True
+# Size in bytes of each array file this process has memory-mapped, by path - used to report the memory it shares
+attached = {}
+
+
+# Load a .npy file - memory-mapped read-only without copying when the store is enabled, otherwise read into process memory. None if it is missing or cannot be read
+def load_array(path):
+    try:
+        array = np.load(path, mmap_mode="r" if enabled else None)
+    except (FileNotFoundError, ValueError, OSError):
+        return None
+    if enabled:
+        # A plain ndarray view of the mapping, so that results computed from it are ordinary arrays
+        array = array.view(np.ndarray)
+        attached[str(path)] = array.nbytes
+    return array
+
+
+# Save an array as a .npy file - written to a temporary file first, so that other processes never map a partly written file
+def save_array(path, array):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as f:
+        np.save(f, np.asarray(array))
+    os.replace(f.name, path)
+
+
+# Array stored by name, or compute() saved to the store and then attached, so that this process shares the stored copy too - compute() kept in process memory if the store is disabled or cannot be written to
+def get_array(name, compute):
+    global available
+    if not enabled or not available:
+        return compute()
+    path = store_dir / f"{name}.npy"
+    array = load_array(path)
+    if array is None:
+        array = compute()
+        try:
+            save_array(path, array)
+        except OSError:
+            available = False
+            return array
+        stored = load_array(path)
+        if stored is not None:
+            array = stored
+    return array
+
+
+# Delete the stored arrays not named in keep (e.g. those of older versions of the data files) - processes that have them mapped keep their copy until they exit
+def prune(keep):
+    if not enabled or not store_dir.is_dir():
+        return
+    for path in store_dir.glob("*.npy"):
+        if path.stem not in keep:
+            path.unlink(missing_ok=True)
+
+
+# Memory used by this process, in bytes - resident (rss), its proportional share of the pages it shares with other processes (pss), shared and private resident pages, and the size of the stored arrays it has mapped. Only the mapped size is available outside Linux
+def memory_usage():
+    usage = {"attached": sum(attached.values())}
+    fields = {"Rss:": "rss", "Pss:": "pss", "Shared_Clean:": "shared", "Shared_Dirty:": "shared", "Private_Clean:": "private", "Private_Dirty:": "private"}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if parts and parts[0] in fields:
+                    usage[fields[parts[0]]] = usage.get(fields[parts[0]], 0) + int(parts[1]) * 1024
+    except OSError:
+        pass
+    return usage
@@ -1,18 +1,65 @@
+import gzip
+import brotli
+import flask
 from dash import Dash, html, dcc
 import dash_bootstrap_components as dbc
-from hyp_model import create_blank_fig
+from hyp_model import max_upload_bytes
+from hyp_assets import serve_precompressed
 
-# Specify HTML <head> elements
-app = Dash(__name__,
-           title="One-sample Hypothesis Testing",
-           update_title=None,
-           external_stylesheets=[dbc.themes.BOOTSTRAP],
-           meta_tags=[{"name": "viewport",
-                       "content": "width=device-width, initial-scale=1.0, maximum-scale=1.0"}])
+# Confidence level slider marks - also used to precompute t-test results in *_controller.py
+alpha_marks = {0.8: {"label": "80%"},
+               0.85: {"label": "85%"},
+               0.9: {"label": "90%"},
+               0.95: {"label": "95%"},
+               0.99: {"label": "99%"}}
+
+# Dash app that serializes and compresses the layout once, on the first page load, rather than on every page load - the layout does not change once the app has started. Fast compression levels are used as the first page load waits for them
+class CachedLayoutDash(Dash):
+    layout_response = None
+    # Brotli and gzip compressed layout, keyed on content encoding
+    layout_compressed = None
+
+    def serve_layout(self):
+        if self.layout_response is None:
+            self.layout_response = super().serve_layout().get_data()
+            self.layout_compressed = {"br": brotli.compress(self.layout_response, quality=5),
+                                      "gzip": gzip.compress(self.layout_response, compresslevel=6, mtime=0)}
+        encoding = next((encoding for encoding in self.layout_compressed if encoding in flask.request.accept_encodings), None)
+        if encoding is None:
+            return flask.Response(self.layout_response, mimetype="application/json")
+        response = flask.Response(self.layout_compressed[encoding], mimetype="application/json")
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+# Specify HTML <head> elements - the Bootstrap stylesheet (dbc.themes.BOOTSTRAP) is served from assets/bootstrap.min.css, so that the app works offline
+app = CachedLayoutDash(__name__,
+                       title="One-sample Hypothesis Testing",
+                       update_title=None,
+                       compress=True,
+                       meta_tags=[{"name": "viewport",
+                                   "content": "width=device-width, initial-scale=1.0, maximum-scale=1.0"}])
+# Compress dynamic responses (page, layout and callback responses) on the fly with gzip, except those that already fit in a single packet. Static assets and component bundles are precompressed by python hyp_assets.py
+app.server.config["COMPRESS_MIN_SIZE"] = 1400
+# Reject requests too big to hold an uploaded file of at most max_upload_bytes, base64 encoded, along with the rest of the callback request
+app.server.config["MAX_CONTENT_LENGTH"] = max_upload_bytes * 4 // 3 + (1 << 20)
+serve_precompressed(app)
+# WSGI application for production servers - see gunicorn.conf.py
+server = app.server
 
 # Specify app layout (HTML <body> elements) using dash.html, dash.dcc and dash_bootstrap_components
 # All component IDs should relate to the Input or Output of callback functions in *_controller.py
 app.layout = dbc.Container([
+    # Dataset values and settings used by clientside callbacks (HYP_CLIENTSIDE=1) - empty otherwise
+    dcc.Store(id="client-data"),
+    # Base figure for each dataset and confidence interval traces for the latest submission, combined in the browser to draw the graph
+    dcc.Store(id="figures"),
+    dcc.Store(id="ci-store"),
+    # p value and power curves for the latest submission in sweep mode, drawn in the browser with the figure template
+    dcc.Store(id="sweep-store"),
+    # Base figure for each dataset uploaded in this session
+    dcc.Store(id="upload-figures", data={}),
     # Row - User Input
     dbc.Row([
         dbc.Col([
@@ -20,13 +67,28 @@ app.layout = dbc.Container([
                 dbc.Label("Data set",
                           className="label",
                           html_for="dropdown"),
-                dbc.Select(id="dropdown",
-                           options=[{"label": "Antacid", "value": "antacid"},
-                                    {"label": "Grades", "value": "grades"},
-                                    {"label": "RDA", "value": "rda"}],
-                           value="antacid"),
+                # Options (one per CSV file in data/, labelled from its metadata) are set by hyp_controller
+                dbc.Select(id="dropdown"),
+                html.Br()
+            ], **{"aria-live": "polite", "aria-atomic": "true"}),
+            # Upload a CSV file (header row, then one number per row) - added to the data set dropdown once validated on the server
+            html.Div([
+                dcc.Upload(id="upload",
+                           children=html.Div(["Drag and drop or ", html.A("select a CSV file", href="#"), " to test your own data"]),
+                           accept=".csv,text/csv,text/plain",
+                           max_size=max_upload_bytes,
+                           className="upload"),
+                html.P(id="upload-status", className="upload-status"),
                 html.Br()
             ], **{"aria-live": "polite", "aria-atomic": "true"}),
+            # Column picker - only shown for multi-column datasets
+            html.Div([
+                dbc.Label("Column",
+                          className="label",
+                          html_for="column"),
+                dbc.Select(id="column"),
+                html.Br()
+            ], id="column-div", style={"display": "none"}, **{"aria-live": "polite"}),
             html.Div([
                 dbc.Label("Data description", className="label"),
                 html.P(id="data-text")
@@ -47,6 +109,20 @@ app.layout = dbc.Container([
                                 "value": ">"}],
                            value="!=")
             ], **{"aria-live": "polite"}),
+            html.Div([
+                dbc.Label("Test method",
+                          className="label",
+                          html_for="method"),
+                dbc.Select(id="method",
+                           options=[
+                               {"label": "t-test and t confidence interval",
+                                "value": "t"},
+                               {"label": "Permutation test and bootstrap confidence interval",
+                                "value": "resample"}],
+                           value="t"),
+                # Resampling limits, set by hyp_controller
+                html.P(id="method-text", className="method-text")
+            ], id="method-div", **{"aria-live": "polite"}),
             html.Div([
                 dbc.Label("Hypothesised mean",
                           className="label",
@@ -65,12 +141,13 @@ app.layout = dbc.Container([
                            value=0.95,
                            min=0.8,
                            max=0.99,
-                           marks={0.8: {"label": "80%"},
-                                  0.85: {"label": "85%"},
-                                  0.9: {"label": "90%"},
-                                  0.95: {"label": "95%"},
-                                  0.99: {"label": "99%"}})
+                           marks=alpha_marks)
             ], **{"aria-live": "polite"}),
+            html.Div([
+                dbc.Switch(id="sweep",
+                           label="Also plot the p value and power for every hypothesised mean",
+                           value=False)
+            ]),
             html.Div([
                 dbc.Button(id="submit",
                            n_clicks=0,
@@ -78,6 +155,19 @@ app.layout = dbc.Container([
                            class_name="button",
                            style={"width": 150})
             ], className="d-flex justify-content-center"),
+            # Shown while a background job (HYP_BACKGROUND=1) runs
+            html.Div([
+                dbc.Progress(id="progress",
+                             value=0,
+                             striped=True,
+                             animated=True,
+                             className="job-progress"),
+                dbc.Button(id="cancel",
+                           n_clicks=0,
+                           children="Cancel",
+                           class_name="button",
+                           style={"width": 100})
+            ], id="progress-div", style={"display": "none"}, className="align-items-center"),
         ], xs=12, xl=6)
     ]),
     # Row - Graph and Results
@@ -85,8 +175,8 @@ app.layout = dbc.Container([
         dbc.Col([
             # Graph components are placed inside a Div with role="img" to manage UX for screen reader users
             html.Div([
+                # Figure of the dataset shown when the page loads, set by hyp_controller
                 dcc.Graph(id="graph",
-                          figure=create_blank_fig(),
                           config={"displayModeBar": False,
                                   "doubleClick": False,
                                   "editable": False,
@@ -98,6 +188,19 @@ app.layout = dbc.Container([
                      children=[],
                      className="sr-only",
                      **{"aria-live": "polite"}),
+            # p value and power curves across the hypothesised mean slider's range - only shown when the sweep switch is on
+            html.Div([
+                dcc.Graph(id="sweep-graph",
+                          config={"displayModeBar": False,
+                                  "doubleClick": False,
+                                  "editable": False,
+                                  "scrollZoom": False,
+                                  "showAxisDragHandles": False})
+            ], id="sweep-div", role="img", style={"display": "none"}, **{"aria-hidden": "true"}),
+            html.Div(id="sr-sweep",
+                     children=[],
+                     className="sr-only",
+                     **{"aria-live": "polite"}),
             html.Br()
         ], xs=12, lg=6),
         dbc.Col([
@@ -132,6 +235,7 @@ app.layout = dbc.Container([
                         html.Br(),
                         html.P(id="conclusion", children=[])
                     ], id="results", style={"display": "none"}, **{"aria-live": "polite", "aria-atomic": "true"}),
+                    html.P(id="results-message", **{"aria-live": "polite"})
                 ])
             ])
         ], xs=12, lg=6)
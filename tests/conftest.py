@@ -0,0 +1,16 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# The hyp_* modules are imported from the repository root, with the caches left cold so that importing hyp_controller does not start a warming thread
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("HYP_WARM_CACHE", "off")
+
+# The shared store and saved uploads are kept in a temporary directory, removed after the tests, rather than in /dev/shm/hyp-store and the server's upload directory
+test_dir = tempfile.mkdtemp(prefix="hyp-tests-")
+atexit.register(shutil.rmtree, test_dir, ignore_errors=True)
+os.environ["HYP_STORE_DIR"] = os.path.join(test_dir, "store")
+os.environ["HYP_UPLOAD_DIR"] = os.path.join(test_dir, "uploads")
@@ -0,0 +1,40 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+import hyp_batch
+
+
+# Jobs with invalid fields are reported as errors, without stopping the other jobs
+@pytest.mark.parametrize("line", ['{"dataset": 5, "hyp_mean": 10, "alternative": "<", "alpha": 0.95}',
+                                  '{"dataset": "happy_quant", "column": ["Height"], "hyp_mean": 170, "alternative": "<", "alpha": 0.95}',
+                                  '{"dataset": "antacid", "hyp_mean": NaN, "alternative": "<", "alpha": 0.95}',
+                                  '{"dataset": "antacid", "hyp_mean": Infinity, "alternative": "<", "alpha": 0.95}',
+                                  '{"dataset": "antacid", "hyp_mean": "10", "alternative": "<", "alpha": 0.95}',
+                                  '{"dataset": "antacid", "hyp_mean": 10, "alternative": ["<"], "alpha": 0.95}',
+                                  '{"dataset": "antacid", "hyp_mean": 10, "alternative": "<", "alpha": "0.95"}',
+                                  '{"dataset": "antacid", "hyp_mean": 10, "alternative": "<", "alpha": NaN}',
+                                  '["antacid", 10, "<", 0.95]',
+                                  "antacid,nan,<,0.95",
+                                  "antacid,10,<,1.5",
+                                  "antacid,10,<<,0.95"])
+def test_invalid_jobs(line):
+    results = [json.loads(result) for result in hyp_batch.run_chunk([line, "antacid,10,<,0.95"]).splitlines()]
+    assert "error" in results[0]
+    assert results[1]["dataset"] == "antacid" and 0 <= results[1]["p"] <= 1
+
+
+# Jobs passed to run_jobs directly are checked too
+def test_run_jobs_checks_jobs():
+    results = hyp_batch.run_jobs([{"dataset": 5, "hyp_mean": 10, "alternative": "<", "alpha": 0.95},
+                                  {"dataset": "antacid", "hyp_mean": 10, "alternative": "less", "alpha": 0.95}])
+    assert "error" in results[0]
+    assert results[1]["alternative"] == "<"
+
+
+# The batch runner does not import the Dash app
+def test_batch_does_not_import_app():
+    code = "import sys, hyp_batch; print('hyp_controller' in sys.modules, 'dash' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=Path(hyp_batch.__file__).parent, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["False", "False"]
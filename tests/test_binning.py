@@ -0,0 +1,99 @@
+import json
+import math
+import shutil
+import subprocess
+from pathlib import Path
+import dash
+import numpy as np
+import pytest
+import hyp_controller
+import hyp_model
+
+node = shutil.which("node")
+bundle_path = Path(dash.__file__).resolve().parent / "dcc" / "plotly.min.js"
+
+# Loads the plotly.js bundle Dash serves with stubs for the browser globals it touches at load time, exposes its browserify module registry by patching the bundle prelude, then for each case reads a histogram trace from stdin and writes the bin centres and counts plotly.js' own calc step gives it
+runner = """
+const fs = require("fs");
+const fake = () => new Proxy(function() {}, {get: (target, key) => key === Symbol.toPrimitive ? (() => "") : (key === "length" ? 0 : fake()), apply: () => fake(), construct: () => fake()});
+global.self = global;
+global.window = global;
+global.document = fake();
+global.navigator = {userAgent: "node"};
+global.DOMParser = fake();
+global.HTMLElement = class {};
+global.getComputedStyle = fake();
+const prelude = 'for(var a="function"==typeof require&&require,o=0;o<n.length;o++)i(n[o]);return i}';
+const source = fs.readFileSync(process.argv[1], "utf8");
+if (!source.includes(prelude)) throw new Error("unexpected bundle prelude");
+const bundle = {exports: {}};
+new Function("module", "exports", "require", source.replace(prelude, prelude.replace("return i}", "global.plotlyModules=e;global.plotlyRequire=i;return i}")))(bundle, bundle.exports, undefined);
+const moduleId = name => {
+    for (const key in global.plotlyModules) {
+        const deps = global.plotlyModules[key][1];
+        for (const dep in deps) if (dep.endsWith(name)) return deps[dep];
+    }
+    throw new Error("no module " + name);
+};
+const Plots = global.plotlyRequire(moduleId("plots/plots"));
+const config = global.plotlyRequire(moduleId("plot_config")).dfltConfig;
+const cases = JSON.parse(fs.readFileSync(0, "utf8"));
+const results = cases.map(({x, start, end, size}) => {
+    const gd = {data: [{type: "histogram", x: x.map(Number), xbins: {start, end, size}}], layout: {width: 700, height: 400}, _context: Object.assign({}, config)};
+    Plots.supplyDefaults(gd);
+    Plots.doCalcdata(gd);
+    return gd.calcdata[0].filter(bin => bin.p !== undefined).map(bin => [bin.p, bin.s]);
+});
+process.stdout.write(JSON.stringify(results));
+"""
+
+
+# Bin counts plotly.js gives each case, placed by bin centre - plotly.js leaves empty bins off either end of its calcdata, so those are filled with zeros
+def plotly_bin_counts(cases):
+    if node is None or not bundle_path.exists():
+        pytest.skip("node or the plotly.js bundle is not available")
+    # JSON has no NaN or infinity, so values go as strings and the runner converts them back with Number
+    payload = json.dumps([{"x": [repr(float(value)) for value in values], "start": start, "end": end, "size": size} for values, start, end, size in cases])
+    result = subprocess.run([node, "-e", runner, str(bundle_path)], input=payload, capture_output=True, text=True, check=True)
+    counts = []
+    for (values, start, end, size), bins in zip(cases, json.loads(result.stdout)):
+        case_counts = [0] * hyp_model.bin_total(start, end, size)
+        for centre, count in bins:
+            case_counts[round((centre - start) / size - 0.5)] = count
+        counts.append(case_counts)
+    return counts
+
+
+# Values on every bin edge and just either side of it, exactly at end, outside the bins and missing
+def edge_values(start, end, size):
+    edges = [start + i * size for i in range(round((end - start) / size) + 1)]
+    return np.array(edges + [edge + size * 1e-12 for edge in edges] + [edge - size * 1e-6 for edge in edges]
+                    + [end, start - size, end + size, math.nan, math.inf, -math.inf])
+
+
+# The histogram bars of every bundled dataset and column, and bins with fractional sizes where adding the size repeatedly accumulates rounding error, count the same values in each bin as plotly.js' histogram does
+def test_bin_counts_match_plotly():
+    cases = []
+    for dataset, config in hyp_controller.configs.items():
+        settings = config.histogram
+        values = hyp_model.get_values(dataset)
+        for sample in [values, edge_values(settings.start, settings.end, settings.size), np.concatenate([values, [math.nan, settings.end]])]:
+            cases.append((sample, settings.start, settings.end, settings.size))
+    for start, end, size in [(0, 1, 0.1), (-0.3, 0.3, 0.1), (0.5, 2.5, 0.2), (150, 200, 5), (0, 1, 0.3)]:
+        cases.append((edge_values(start, end, size), start, end, size))
+    for (values, start, end, size), expected in zip(cases, plotly_bin_counts(cases)):
+        assert list(hyp_model.bin_counts(values, start, end, size)) == expected, (start, end, size)
+    for dataset, config in hyp_controller.configs.items():
+        settings = config.histogram
+        assert list(hyp_model.get_bin_counts(dataset, settings.start, settings.end, settings.size)) == list(hyp_model.bin_counts(hyp_model.get_values(dataset), settings.start, settings.end, settings.size))
+
+
+# Counts worked out by hand: bins include their left edge but not their right, a value at end is left out, a value a rounding error below an edge goes in the bin above it, and a last partial bin keeps its full width, so it counts values at end
+@pytest.mark.parametrize("values, start, end, size, expected", [
+    ([1, 2, 2, 3, 5, math.nan, 4.999999999999, 0.5, 6], 1, 5, 1, [1, 2, 1, 0]),
+    ([0.3, 0.1 + 0.2, 0.2999, 0.7, 0.9, 1.0], 0, 1, 0.1, [0, 0, 1, 2, 0, 0, 0, 1, 0, 1]),
+    ([0, 0.29, 0.3, 0.6, 0.95, 1], 0, 1, 0.3, [2, 1, 1, 2]),
+    ([150, 154.9, 155, 199.99, 200], 150, 200, 5, [2, 1, 0, 0, 0, 0, 0, 0, 0, 1]),
+])
+def test_bin_counts_by_hand(values, start, end, size, expected):
+    assert list(hyp_model.bin_counts(values, start, end, size)) == expected
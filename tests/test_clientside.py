@@ -0,0 +1,57 @@
+import json
+import shutil
+import subprocess
+from pathlib import Path
+import pytest
+from plotly.utils import PlotlyJSONEncoder
+import hyp_controller
+from hyp_view import alpha_marks
+
+node = shutil.which("node")
+pytestmark = pytest.mark.skipif(node is None, reason="node is not installed")
+
+script_path = Path(hyp_controller.__file__).resolve().parent / "assets" / "hyp_clientside.js"
+
+# Runs hyp_clientside.js with a stub of the dash_clientside object the Dash renderer provides, reading the client data and the update_results arguments of each case from stdin and writing the responses to stdout
+runner = """
+const fs = require("fs");
+global.window = {dash_clientside: {no_update: {}, PreventUpdate: {}}};
+eval(fs.readFileSync(process.argv[1], "utf8"));
+const input = JSON.parse(fs.readFileSync(0, "utf8"));
+const results = input.cases.map(args => window.dash_clientside.hyp.update_results(1, ...args, "t", input.client_data));
+process.stdout.write(JSON.stringify(results));
+"""
+
+
+# update_results arguments for every dataset at each slider mark, with every alternative hypothesis and confidence level
+def parity_cases():
+    cases = []
+    for dataset, config in hyp_controller.configs.items():
+        table, _, column = dataset.partition(":")
+        for hyp_mean in config.slider.marks:
+            for alternative in hyp_controller.relations:
+                for alpha in alpha_marks:
+                    cases.append([table, column or None, hyp_mean, alternative, alpha])
+    return cases
+
+
+# Responses of the clientside update_results for each case
+def run_clientside(cases):
+    client_data = json.dumps({"client_data": hyp_controller.create_client_data(), "cases": cases}, cls=PlotlyJSONEncoder)
+    result = subprocess.run([node, "-e", runner, str(script_path)], input=client_data, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+# The clientside t-test gives the same p value and confidence interval as the server to within 1e-9, and the same text
+def test_update_results_parity():
+    cases = parity_cases()
+    client_responses = run_clientside(cases)
+    assert len(client_responses) == len(cases)
+    for args, client in zip(cases, client_responses):
+        server = hyp_controller.update_results(1, *args, "t")
+        assert client[5] == pytest.approx(server[5], rel=1e-9, abs=1e-9), args
+        assert client[0]["dataset"] == server[0]["dataset"]
+        for client_trace, server_trace in zip(client[0]["traces"], server[0]["traces"]):
+            assert client_trace["x"] == pytest.approx(list(server_trace["x"]), rel=1e-9, abs=1e-9), args
+        assert client[1:5] == list(server[1:5]), args
+        assert client[6:] == list(server[6:]), args
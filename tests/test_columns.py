@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+import scipy.stats as stat
+import hyp_model
+
+alternatives = ["less", "greater", "two-sided"]
+
+
+# SciPy's one-sample t-test and confidence interval for a column of values, ignoring missing values
+def scipy_t_test(values, hyp_mean, alternative, alpha):
+    values = values[~np.isnan(values)]
+    result = stat.ttest_1samp(values, hyp_mean, alternative=alternative)
+    confidence = alpha if alternative != "two-sided" else (2*alpha)-1
+    lower, upper = stat.t.interval(confidence, values.size - 1, loc=values.mean(), scale=stat.sem(values))
+    return result.statistic, result.pvalue, -np.inf if alternative == "less" else lower, np.inf if alternative == "greater" else upper
+
+
+# Check t-test results against SciPy for each column of values
+def check_results(results, values, hyp_mean, alternative, alpha):
+    for i in range(values.shape[1]):
+        expected = scipy_t_test(values[:, i], hyp_mean, alternative, alpha)
+        actual = results[i]
+        assert actual["t"] == pytest.approx(expected[0], rel=1e-9)
+        assert actual["p"] == pytest.approx(expected[1], rel=1e-9, abs=1e-300)
+        assert actual["lower"] == pytest.approx(expected[2], rel=1e-9)
+        assert actual["upper"] == pytest.approx(expected[3], rel=1e-9)
+
+
+# Measurement column values of happy_quant (with missing values as NaN) and its sample groups
+def happy_quant():
+    values = hyp_model.get_values("happy_quant")
+    columns = hyp_model.dataset_columns["happy_quant"]
+    indices = [columns.index(column) for column in hyp_model.get_measurement_columns("happy_quant")]
+    return values[:, indices], values[:, columns.index("sample")]
+
+
+# Summaries ignore missing values, matching NumPy on the values that are present
+def test_summarise_columns_missing_values():
+    values = np.array([[1.0, np.nan], [2.0, 5.0], [4.0, 6.0], [np.nan, 10.0]])
+    summaries = hyp_model.summarise_columns(values)
+    for i in range(values.shape[1]):
+        present = values[~np.isnan(values[:, i]), i]
+        assert summaries[i]["n"] == present.size
+        assert summaries[i]["mean"] == pytest.approx(present.mean())
+        assert summaries[i]["var"] == pytest.approx(present.var(ddof=1))
+        assert summaries[i]["sem"] == pytest.approx(stat.sem(present))
+        assert summaries[i]["nu"] == present.size - 1
+
+
+# Every happy_quant column, several of which have missing values, against SciPy
+@pytest.mark.parametrize("alternative", alternatives)
+@pytest.mark.parametrize("alpha", [0.8, 0.95, 0.99])
+def test_t_test_columns(alternative, alpha):
+    values, _ = happy_quant()
+    assert np.isnan(values).any()
+    columns, labels, results = hyp_model.t_test_columns("happy_quant", 20, alternative, alpha)
+    assert columns == hyp_model.get_measurement_columns("happy_quant")
+    assert labels is None
+    check_results(results, values, 20, alternative, alpha)
+
+
+# Every happy_quant column within each sample group against SciPy
+@pytest.mark.parametrize("alternative", alternatives)
+def test_t_test_columns_grouped(alternative):
+    values, groups = happy_quant()
+    _, labels, results = hyp_model.t_test_columns("happy_quant", 20, alternative, 0.95, group_column="sample")
+    assert list(labels) == list(np.unique(groups))
+    for label, group_results in zip(labels, results):
+        check_results(group_results, values[groups == label], 20, alternative, 0.95)
+
+
+# Group summaries match the summaries of each group's rows on their own
+def test_summarise_groups():
+    values, groups = happy_quant()
+    labels, summaries = hyp_model.summarise_groups(values, groups)
+    for label, group_summaries in zip(labels, summaries):
+        expected = hyp_model.summarise_columns(values[groups == label])
+        for field in ["n", "mean", "var", "sem", "nu"]:
+            assert group_summaries[field] == pytest.approx(expected[field], rel=1e-12)
@@ -0,0 +1,58 @@
+import copy
+import json
+import pickle
+import numpy as np
+import pytest
+from plotly.utils import PlotlyJSONEncoder
+import hyp_config
+import hyp_model
+
+
+# Bin widths are rounded up to 1, 2 or 5 times a power of 10
+@pytest.mark.parametrize("width, size", [(5.1, 10), (1, 1), (1.01, 2), (0.3, 0.5), (0.07, 0.1), (2.5, 5), (120, 200)])
+def test_nice_size(width, size):
+    assert hyp_config.nice_size(width) == pytest.approx(size)
+
+
+# Settings for a file without metadata (data/age.csv) are derived from its values - around 10 bins covering the values, with the slider over the same range in steps of a fifth of a bin, starting at the sample mean
+def test_derived_config():
+    assert not (hyp_model.data_dir / "age.json").exists()
+    values = hyp_model.get_values("age")
+    config = hyp_config.get_config("age")
+    assert (values.min(), values.max(), values.mean()) == (8, 59, pytest.approx(35.1))
+    assert (config.histogram.start, config.histogram.end, config.histogram.size) == (0, 60, 10)
+    assert config.histogram.name == "age"
+    assert config.histogram.description == "Histogram of age for 10 values"
+    assert config.hypothesis.null.format(hyp_mean=30) == "The actual mean age is equal to 30"
+    assert (config.slider.min, config.slider.max, config.slider.step, config.slider.value) == (0, 60, 2, 36)
+    assert config.slider.marks == {mark: {"label": str(mark)} for mark in range(0, 70, 10)}
+    assert config.outputs == (0, 60, 36, config.slider.marks, 2, config.slider.text)
+
+
+# Metadata overrides only the settings it gives - the rest are still derived
+def test_compile_config_metadata():
+    values = np.array([0.12, 0.31, 0.55, 0.94])
+    config = hyp_config.compile_config("x", values, {"histogram": {"name": "X"}, "slider": {"value": 0.5}}, "x", "", "")
+    assert (config.histogram.start, config.histogram.end, config.histogram.size) == (0.1, 1, 0.1)
+    assert config.histogram.name == "X" and config.histogram.hovertemplate.startswith("x: ")
+    assert (config.slider.step, config.slider.value) == (0.02, 0.5)
+
+
+# Configs and the dicts they hold cannot be changed, as they are shared by every request, but are still serialized and pickled as plain dicts
+def test_config_immutable():
+    config = hyp_config.get_config("antacid")
+    with pytest.raises(AttributeError):
+        config.slider = None
+    with pytest.raises(AttributeError):
+        config.slider.value = 0
+    with pytest.raises(TypeError):
+        config.info["value"] = 0
+    with pytest.raises(TypeError):
+        config.slider.marks.pop(config.slider.min)
+    with pytest.raises(TypeError):
+        config.slider.marks[config.slider.min]["label"] = ""
+    with pytest.raises(TypeError):
+        config.info |= {"value": 0}
+    assert json.loads(json.dumps(config.info, cls=PlotlyJSONEncoder))["value"] == config.slider.value
+    assert pickle.loads(pickle.dumps(config.info)) == config.info
+    assert copy.deepcopy(config.info) == config.info
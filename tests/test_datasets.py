@@ -0,0 +1,44 @@
+from functools import partial
+import numpy as np
+import hyp_model
+from hyp_config import compile_config
+
+
+# Missing values in a single-column CSV file are dropped, as they are from each column of a multi-column file, so that its summary and settings can be derived
+def test_single_column_missing_values(tmp_path, monkeypatch):
+    path = tmp_path / "gaps.csv"
+    path.write_text("x\n1\n2\n\n3\nNA\n4\n")
+    monkeypatch.setitem(hyp_model.dataset_loaders, "gaps", partial(hyp_model.read_csv_values, path))
+    monkeypatch.delitem(hyp_model.dataset_values, "gaps", raising=False)
+    values = hyp_model.get_values("gaps")
+    assert list(values) == [1, 2, 3, 4]
+    assert hyp_model.summarise(values)["mean"] == 2.5
+    config = compile_config("gaps", values, {}, "x", "", "")
+    assert (config.histogram.start, config.histogram.end) == (1, 4)
+
+
+# A multi-column file keeps one row per CSV row, with missing values as NaN
+def test_multi_column_missing_values(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text("a,b\n1,\n")
+    values = hyp_model.read_csv_values(path)
+    assert values.shape == (1, 2)
+    assert values[0, 0] == 1 and np.isnan(values[0, 1])
+
+
+# The shared store holds the columns of a multi-column file, which are tested and drawn, but not the whole table as well
+def test_store_multi_column(tmp_path, monkeypatch):
+    monkeypatch.setattr(hyp_model.hyp_store, "store_dir", tmp_path)
+    monkeypatch.setattr(hyp_model.hyp_store, "enabled", True)
+    # As in the launcher, where no dataset has been loaded yet
+    monkeypatch.setattr(hyp_model, "dataset_values", {})
+    hyp_model.build_store()
+    stored = {path.name.split("-")[0] for path in tmp_path.glob("*-values-*.npy")}
+    assert "happy_quant" not in stored
+    assert {f"happy_quant.{column}" for column in hyp_model.dataset_columns["happy_quant"]} <= stored
+    assert {"antacid", "rda"} <= stored
+    # The columns are tested from their stored summaries, as they were from the table's
+    results = hyp_model.t_test_columns("happy_quant", 10, "two-sided", 0.95)[2]
+    indices = [hyp_model.dataset_columns["happy_quant"].index(column) for column in hyp_model.get_measurement_columns("happy_quant")]
+    expected = hyp_model.t_test_summaries(hyp_model.get_column_summaries("happy_quant")[indices], 10, "two-sided", 0.95)
+    assert np.array_equal(results, expected)
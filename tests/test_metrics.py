@@ -0,0 +1,36 @@
+import os
+import flask
+import pytest
+import hyp_metrics
+
+
+# A negative duration records an empty profile rather than failing, and the profiler is always stopped afterwards
+def test_record_profile_clamps_seconds(tmp_path, monkeypatch):
+    monkeypatch.setattr(hyp_metrics, "profile_dir", str(tmp_path))
+    path, text = hyp_metrics.record_profile(-1)
+    assert path is not None
+    assert hyp_metrics.profiler is None
+
+
+# Only the newest profile_keep snapshots are kept
+def test_record_profile_prunes_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(hyp_metrics, "profile_dir", str(tmp_path))
+    monkeypatch.setattr(hyp_metrics, "profile_keep", 2)
+    for i in range(4):
+        (tmp_path / f"hyp-1-2026010{i}-000000.prof").write_bytes(b"")
+        os.utime(tmp_path / f"hyp-1-2026010{i}-000000.prof", (i, i))
+    path, _ = hyp_metrics.record_profile(0)
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted([os.path.basename(path), "hyp-1-20260103-000000.prof"])
+
+
+# Profiles can only be recorded from the same host, or with the token if one is set
+@pytest.mark.parametrize("token, address, query, allowed", [(None, "127.0.0.1", "", True),
+                                                            (None, "::1", "", True),
+                                                            (None, "10.0.0.2", "", False),
+                                                            ("secret", "10.0.0.2", "?token=secret", True),
+                                                            ("secret", "127.0.0.1", "?token=wrong", False),
+                                                            ("secret", "127.0.0.1", "", False)])
+def test_profile_allowed(monkeypatch, token, address, query, allowed):
+    monkeypatch.setattr(hyp_metrics, "profile_token", token)
+    with flask.Flask(__name__).test_request_context(f"/metrics/profile{query}", environ_base={"REMOTE_ADDR": address}):
+        assert hyp_metrics.profile_allowed() == allowed
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+import hyp_controller
+import hyp_model
+
+
+# Larger samples get fewer resamples, so that each resampling draws at most resample_max_values values
+@pytest.mark.parametrize("dataset", ["antacid", "rda", "happy_quant:Height"])
+def test_resample_budget(dataset):
+    values, total = hyp_model.resample_values(dataset)
+    assert total == min(hyp_model.resamples, hyp_model.resample_max_values // values.size)
+    assert total >= hyp_model.min_resamples
+    assert hyp_model.bootstrap_means(dataset).size == total
+    assert hyp_model.sign_flip_sums(dataset)[0].size == total
+
+
+# Samples too large to resample within the budget are refused with a message for the user
+def test_resample_too_large(tmp_path, monkeypatch):
+    monkeypatch.setattr(hyp_model, "upload_dir", tmp_path)
+    size = hyp_model.max_resample_size() + 1
+    dataset = hyp_model.add_upload(("x\n" + "\n".join(map(str, np.arange(size) % 97)) + "\n").encode(), check_size=False)
+    with pytest.raises(ValueError, match="t-test"):
+        hyp_model.t_test_2sided(dataset, 50, 0.95, "resample")
+    # The t-test is not limited
+    assert 0 <= hyp_model.t_test_2sided(dataset, 50, 0.95)[0] <= 1
+
+
+# A submission of a sample too large to resample shows the message in place of the results, leaving no p value for the accept/reject feedback to use
+def test_update_results_too_large(tmp_path, monkeypatch):
+    monkeypatch.setattr(hyp_model, "upload_dir", tmp_path)
+    monkeypatch.setattr(hyp_model, "resample_max_values", 2000 * hyp_model.min_resamples)
+    dataset = hyp_model.add_upload(("x\n" + "\n".join(map(str, np.arange(2001) % 97)) + "\n").encode())
+    response = hyp_controller.update_results(1, dataset, None, 50, "!=", 0.95, "resample")
+    ci_traces, null_hyp, p, results_style, message = response[0], response[2], response[5], response[8], response[10]
+    assert ci_traces is hyp_controller.no_update
+    assert null_hyp == "" and p is None
+    assert results_style == {"display": "none"}
+    assert "use the t-test" in message
+    assert hyp_controller.accept_or_reject("accept", p, 0.95) == ""
+
+
+# Resampling results are kept in the shared store, keyed on the dataset, seed and number of resamples, so that another process (e.g. a background job) maps them rather than resampling again
+@pytest.mark.parametrize("upload", [False, True])
+def test_resample_arrays_stored(tmp_path, monkeypatch, upload):
+    monkeypatch.setattr(hyp_model.hyp_store, "store_dir", tmp_path / "store")
+    monkeypatch.setattr(hyp_model.hyp_store, "enabled", True)
+    monkeypatch.setattr(hyp_model, "upload_dir", tmp_path / "uploads")
+    dataset = hyp_model.add_upload(b"x\n1\n4\n2\n8\n5\n7\n") if upload else "antacid"
+    hyp_model.bootstrap_means.cache_clear()
+    hyp_model.sign_flip_sums.cache_clear()
+    means = hyp_model.bootstrap_means(dataset)
+    flipped, signs = hyp_model.sign_flip_sums(dataset)
+    total = hyp_model.resample_values(dataset)[1]
+    assert len(list((tmp_path / ("uploads" if upload else "store")).glob(f"*-{hyp_model.resample_seed}-{total}*.npy"))) == 2
+    # As if in a new process, which has not resampled the dataset
+    hyp_model.bootstrap_means.cache_clear()
+    hyp_model.sign_flip_sums.cache_clear()
+    def resample(*args):
+        raise AssertionError("resampled again")
+    monkeypatch.setattr(hyp_model, "resample", resample)
+    try:
+        assert np.array_equal(hyp_model.bootstrap_means(dataset), means)
+        assert np.array_equal(hyp_model.sign_flip_sums(dataset)[0], flipped)
+        assert np.array_equal(hyp_model.sign_flip_sums(dataset)[1], signs)
+    finally:
+        hyp_model.bootstrap_means.cache_clear()
+        hyp_model.sign_flip_sums.cache_clear()
@@ -0,0 +1,60 @@
+import pytest
+import hyp_controller
+import hyp_model
+
+pytestmark = pytest.mark.skipif(hyp_controller.response_cache.maxsize <= 0 or hyp_controller.background, reason="the response cache is disabled")
+
+
+# Request body for update_results, as the Dash renderer posts it to /_dash-update-component
+def results_body(client, dataset, hyp_mean, method="t"):
+    callback = next(d for d in client.get("/_dash-dependencies").get_json() if d["output"] == hyp_controller.results_callback_id)
+    values = {"submit": 1, "dropdown": dataset, "column": None, "hyp-mean": hyp_mean, "alt-hyp-dropdown": "!=", "alpha": 0.95, "method": method}
+    return {"output": callback["output"],
+            "outputs": [{"id": o.split(".")[0], "property": o.split(".")[1]} for o in callback["output"].strip(".").split("...")],
+            "inputs": [dict(i, value=values[i["id"]]) for i in callback["inputs"]],
+            "changedPropIds": ["submit.n_clicks"],
+            "state": [dict(s, value=values[s["id"]]) for s in callback["state"]]}
+
+
+# Post a submission and return the response body and the number of response cache hits it added
+def post(client, body):
+    hits = hyp_controller.response_cache.stats()["hits"]
+    response = client.post("/_dash-update-component", json=body)
+    assert response.status_code == 200
+    return response.data, hyp_controller.response_cache.stats()["hits"] - hits
+
+
+@pytest.fixture
+def client():
+    hyp_controller.response_cache.clear()
+    return hyp_controller.server.test_client()
+
+
+# A repeated submission is served from the cache, byte for byte
+def test_repeated_submission_cached(client):
+    body = results_body(client, "grades", 87)
+    first, first_hits = post(client, body)
+    second, second_hits = post(client, body)
+    assert (first_hits, second_hits) == (0, 1)
+    assert first == second
+
+
+# 12 and 12.0 are shown differently in the hypothesis text, so are cached separately
+def test_whole_and_float_hyp_means_cached_separately(client):
+    whole, _ = post(client, results_body(client, "antacid", 12))
+    decimal, hits = post(client, results_body(client, "antacid", 12.0))
+    assert hits == 0
+    assert b"equal to 12 " in whole and b"equal to 12.0 " in decimal
+    assert post(client, results_body(client, "antacid", 12.0)) == (decimal, 1)
+
+
+# Uploaded datasets are not cached, so that they cannot evict the built-in datasets' responses
+def test_uploads_not_cached(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(hyp_model, "upload_dir", tmp_path)
+    dataset = hyp_model.add_upload(b"x\n1\n2\n4\n")
+    body = results_body(client, dataset, 2)
+    first, _ = post(client, body)
+    second, hits = post(client, body)
+    assert hits == 0
+    assert first == second
+    assert hyp_controller.response_cache.stats()["size"] == 0
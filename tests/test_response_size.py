@@ -0,0 +1,15 @@
+import pytest
+from plotly.io.json import to_json_plotly
+import hyp_controller
+
+# Serialized size of the confidence interval traces sent for each submission - two traces whatever the dataset and alternative hypothesis
+max_ci_bytes = 600
+
+
+# The confidence interval traces stay within max_ci_bytes for every dataset and alternative hypothesis
+@pytest.mark.parametrize("dataset", list(hyp_controller.configs))
+@pytest.mark.parametrize("alternative", ["<", ">", "!="])
+def test_ci_traces_size(dataset, alternative):
+    config = hyp_controller.configs[dataset]
+    ci_traces, _ = hyp_controller.update_histogram(dataset, config.slider.value, alternative, 0.95)
+    assert len(to_json_plotly(ci_traces)) <= max_ci_bytes
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+import hyp_model
+
+
+# A one-column CSV file of values
+def write_csv(path, values):
+    np.savetxt(path, values, header="value", comments="")
+    return path
+
+
+# Registering a streamed dataset again with a different file clears the p values cached for the old file
+def test_register_streamed_dataset_clears_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(hyp_model, "streamed_datasets", {})
+    cleared = []
+    monkeypatch.setattr(hyp_model, "clear_hooks", [lambda: cleared.append(True)])
+    hyp_model.register_streamed_dataset("streamed", write_csv(tmp_path / "a.csv", [1.0, 2.0, 3.0, 4.0]))
+    before = hyp_model.t_test_p_cached("streamed", 2.5, "two-sided")
+    hyp_model.register_streamed_dataset("streamed", write_csv(tmp_path / "b.csv", [11.0, 12.0, 13.0, 14.0]))
+    after = hyp_model.t_test_p_cached("streamed", 2.5, "two-sided")
+    assert before == pytest.approx(1.0)
+    assert after < 0.001
+    assert len(cleared) == 2
+    hyp_model.clear_dataset_caches()
+
+
+# The resampling method needs the values in memory, so is refused for streamed datasets
+def test_resample_streamed_dataset(tmp_path, monkeypatch):
+    monkeypatch.setattr(hyp_model, "streamed_datasets", {})
+    hyp_model.register_streamed_dataset("streamed", write_csv(tmp_path / "a.csv", [1.0, 2.0, 3.0, 4.0]))
+    with pytest.raises(ValueError, match="t-test"):
+        hyp_model.t_test_2sided("streamed", 2.5, 0.95, "resample")
+    hyp_model.clear_dataset_caches()
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import scipy.stats as stat
+import hyp_controller
+import hyp_model
+from hyp_config import get_config
+
+
+# Power of the one-sample t-test of null_mean at confidence level alpha if the population mean were mean, straight from the noncentral t distribution - rejecting when the p value is below 1 - alpha
+def scipy_power(values, null_mean, mean, alternative, alpha):
+    nu = values.size - 1
+    noncentrality = (mean - null_mean) / stat.sem(values)
+    if alternative == "less":
+        return stat.nct.cdf(stat.t.ppf(1 - alpha, nu), nu, noncentrality)
+    if alternative == "greater":
+        return stat.nct.sf(stat.t.ppf(alpha, nu), nu, noncentrality)
+    crit = stat.t.ppf(1 - (1 - alpha) / 2, nu)
+    return stat.nct.sf(crit, nu, noncentrality) + stat.nct.cdf(-crit, nu, noncentrality)
+
+
+# p values and power across the slider's range match SciPy to within 1e-8, both when power is computed at every point and when it is interpolated with a spline - the power is that of the test of the selected hypothesised mean, equal to 1 - alpha there
+@pytest.mark.parametrize("dataset", ["antacid", "rda", "happy_quant:Height"])
+@pytest.mark.parametrize("spline", [False, True])
+@pytest.mark.parametrize("alternative", ["less", "greater", "two-sided"])
+def test_t_test_sweep(dataset, spline, alternative):
+    values = hyp_model.get_values(dataset)
+    slider = get_config(dataset).slider
+    knots = np.ceil((slider.max - slider.min) / stat.sem(values) / hyp_model.power_spacing) + 1
+    hyp_means = np.linspace(slider.min, slider.max, 10001 if spline else 11)
+    assert (hyp_means.size > knots) == spline
+    results = hyp_model.t_test_sweep(dataset, hyp_means, alternative, 0.95, slider.value)
+    with np.errstate(invalid="ignore"):
+        power = scipy_power(values, slider.value, hyp_means, alternative, 0.95)
+    assert results["p"] == pytest.approx(stat.ttest_1samp(values[:, None], hyp_means, alternative=alternative).pvalue, abs=1e-8)
+    assert results["power"] == pytest.approx(power, abs=1e-8)
+    assert hyp_model.t_test_sweep(dataset, [slider.value], alternative, 0.95, slider.value)["power"][0] == pytest.approx(0.05, abs=1e-8)
+
+
+# With the permutation test selected, the sweep's p values are those of the permutation test at each hypothesised mean, and the curve is labelled as such
+@pytest.mark.parametrize("alternative", ["<", ">", "!="])
+def test_permutation_sweep(alternative):
+    slider = get_config("antacid").slider
+    sweep, sr_text = hyp_controller.create_sweep("antacid", slider.value, alternative, 0.95, "resample")
+    hyp_means = sweep["data"][0]["x"]
+    expected = [hyp_model.permutation_p("antacid", hyp_mean, hyp_model.alternatives[alternative]) for hyp_mean in hyp_means]
+    assert list(sweep["data"][0]["y"]) == pytest.approx(expected, abs=1e-6)
+    assert "Permutation" in sweep["data"][0]["name"]
+    assert sr_text.startswith("Permutation test p value")
@@ -0,0 +1,67 @@
+import base64
+import pytest
+import hyp_controller
+import hyp_model
+
+
+# Files a t-test or histogram cannot be drawn for are refused with a message for the user
+@pytest.mark.parametrize("contents, message", [(b"x\n1\n1\n", "all the same"),
+                                               (b"x\n1\n1.000000000001\n", "too close together"),
+                                               (b"x\n1e-12\n2e-12\n", "too close together"),
+                                               (b"x\n1e300\n-1e300\n", "too large"),
+                                               (b"x\n1\nnan\n", "finite"),
+                                               (b"x\n1\n", "at least two"),
+                                               (b"1\n2\n", "header"),
+                                               (b"x\n1\ny\n", "Row 3")])
+def test_parse_upload_rejects(contents, message):
+    with pytest.raises(ValueError, match=message):
+        hyp_model.parse_upload(contents)
+
+
+def test_parse_upload():
+    label, values = hyp_model.parse_upload(b"\xef\xbb\xbfHeight\n1.5\n2\n2.5\n")
+    assert label == "Height"
+    assert list(values) == [1.5, 2, 2.5]
+
+
+# Dataset names from the browser are only used in file paths if they are those of uploaded datasets
+@pytest.mark.parametrize("dataset", ["upload-../../etc/passwd", "upload-" + "0" * 31, "upload-" + "A" * 32, "upload-" + "0" * 32 + "/x"])
+def test_load_upload_rejects_names(dataset):
+    assert hyp_model.load_upload(dataset) is None
+    with pytest.raises(KeyError):
+        hyp_model.get_upload(dataset)
+
+
+# An accepted upload is added to the dropdown and selected, with its base figure
+def test_upload_dataset(tmp_path, monkeypatch):
+    monkeypatch.setattr(hyp_model, "upload_dir", tmp_path)
+    contents = "data:text/csv;base64," + base64.b64encode(b"Height\n1.5\n2\n2.5\n3\n").decode()
+    options, dataset, figures, message = hyp_controller.upload_dataset(contents, "height.csv", [], None)[:4]
+    assert hyp_model.upload_pattern.fullmatch(dataset)
+    assert options == [{"label": "height.csv", "value": dataset}]
+    assert dataset in figures
+    assert message == "height.csv: 4 values uploaded"
+
+
+# An upload whose histogram cannot be drawn is reported to the user rather than failing the request
+def test_upload_dataset_figure_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(hyp_model, "upload_dir", tmp_path)
+    def create_base_figure(dataset):
+        raise OverflowError("cannot convert float infinity to integer")
+    monkeypatch.setattr(hyp_controller, "create_base_figure", create_base_figure)
+    contents = "data:text/csv;base64," + base64.b64encode(b"Height\n1\n2\n").decode()
+    response = hyp_controller.upload_dataset(contents, "height.csv", [], None)
+    assert response[:3] == (hyp_controller.no_update,) * 3
+    assert "cannot be drawn" in response[3].children
+
+
+# An evicted upload is reported in place of the results, leaving no p value for the accept/reject feedback to use
+def test_update_results_evicted_upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(hyp_model, "upload_dir", tmp_path)
+    response = hyp_controller.update_results(1, "upload-" + "0" * 32, None, 5, "=", 0.95, "t")
+    ci_traces, null_hyp, p, results_style, message = response[0], response[2], response[5], response[8], response[10]
+    assert ci_traces is hyp_controller.no_update
+    assert null_hyp == "" and p is None
+    assert results_style == {"display": "none"}
+    assert "no longer available" in message
+    assert hyp_controller.accept_or_reject("reject", p, 0.95) == ""